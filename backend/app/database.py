@@ -1,6 +1,8 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 # Ensure data directory exists
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
@@ -9,12 +11,65 @@ os.makedirs(DATA_DIR, exist_ok=True)
 # Create database URL
 DB_PATH = os.path.join(DATA_DIR, "ski_lifts.db")
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Milliseconds a connection waits for a lock held by another writer
+DATABASE_BUSY_TIMEOUT = int(os.environ.get("DATABASE_BUSY_TIMEOUT", 5000))
+# Connections kept open per engine, plus the extra ones allowed under load
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", 10))
+DATABASE_MAX_OVERFLOW = int(os.environ.get("DATABASE_MAX_OVERFLOW", 10))
+
+
+def _configure_sqlite(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection for concurrent readers and a single writer
+
+    In WAL mode readers no longer block on a writer (and vice versa), and with
+    synchronous=NORMAL a commit only syncs the log at checkpoints. Remaining
+    writer/writer conflicts wait for the busy timeout instead of failing with
+    "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={DATABASE_BUSY_TIMEOUT}")
+    cursor.close()
+
+
+def make_engine(url=SQLALCHEMY_DATABASE_URL):
+    """Create a synchronous engine, used by background writers and scripts"""
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_size=DATABASE_POOL_SIZE,
+        max_overflow=DATABASE_MAX_OVERFLOW,
+    )
+    event.listen(engine, "connect", _configure_sqlite)
+    return engine
+
+
+def make_async_engine(url=ASYNC_DATABASE_URL):
+    """Create an aiosqlite engine, used by the request handlers"""
+    # aiosqlite defaults to opening a new connection per session; pooling them
+    # keeps the connection threads and PRAGMA setup off the request path
+    engine = create_async_engine(
+        url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=DATABASE_POOL_SIZE,
+        max_overflow=DATABASE_MAX_OVERFLOW,
+    )
+    event.listen(engine.sync_engine, "connect", _configure_sqlite)
+    return engine
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = make_async_engine()
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 
 def get_db():
     db = SessionLocal()
@@ -22,3 +77,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,250 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+MODELS_DIR = "models"
+CLASSES_PATH = os.path.join(MODELS_DIR, "coco.names")
+
+# Detector used when a request or camera does not pick one
+DETECTION_BACKEND = os.environ.get("DETECTION_BACKEND", "yolov3")
+# Network input size in pixels (multiple of 32), 0 uses the backend's default
+DETECTION_INPUT_SIZE = int(os.environ.get("DETECTION_INPUT_SIZE", 0))
+# Largest network input size a request may ask for
+DETECTION_MAX_INPUT_SIZE = int(os.environ.get("DETECTION_MAX_INPUT_SIZE", 1280))
+# Device the networks run on: cpu, opencl or opencl_fp16
+DETECTION_TARGET = os.environ.get("DETECTION_TARGET", "cpu")
+# OpenCV threads per inference process, 0 splits the cores between workers
+DETECTION_THREADS = int(os.environ.get("DETECTION_THREADS", 0))
+
+DNN_TARGETS = {
+    "cpu": cv2.dnn.DNN_TARGET_CPU,
+    "opencl": cv2.dnn.DNN_TARGET_OPENCL,
+    "opencl_fp16": cv2.dnn.DNN_TARGET_OPENCL_FP16,
+}
+
+
+class DetectorBackend:
+    """
+    A YOLO-style detector that can be loaded through cv2.dnn
+
+    `output_format` describes the layout of the network outputs:
+
+    - "darknet": rows of [cx, cy, w, h, objectness, class scores...] relative to
+      the image, as produced by the darknet region layers
+    - "yolov5": the same columns in input pixels, class scores not yet
+      multiplied by the objectness (YOLOv5/v7 ONNX exports)
+    - "yolov8": [cx, cy, w, h, class scores...] in input pixels, transposed to
+      one column per candidate (YOLOv8 ONNX exports)
+
+    All formats are converted to the darknet layout, so the post-processing is
+    the same for every backend.
+    """
+
+    def __init__(
+        self,
+        name,
+        weights_path,
+        config_path=None,
+        classes_path=CLASSES_PATH,
+        input_size=416,
+        output_format="darknet",
+        max_batch_size=16,
+    ):
+        self.name = name
+        self.weights_path = weights_path
+        self.config_path = config_path
+        self.classes_path = classes_path
+        self.input_size = input_size
+        self.output_format = output_format
+        self.max_batch_size = max_batch_size
+
+    @property
+    def available(self):
+        return os.path.exists(self.weights_path) and (
+            self.config_path is None or os.path.exists(self.config_path)
+        )
+
+    def load_net(self):
+        net = cv2.dnn.readNet(self.weights_path, self.config_path or "")
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(
+            DNN_TARGETS.get(DETECTION_TARGET, cv2.dnn.DNN_TARGET_CPU)
+        )
+        return net
+
+    def standardize(self, output, batch_size, input_size):
+        """Reshape one output layer to (batch, rows, 5 + classes) in darknet layout"""
+        if self.output_format == "darknet":
+            # Region layers output (N, rows, 85) for a batch, else (rows, 85)
+            return output.reshape(batch_size, -1, output.shape[-1])
+
+        output = output.reshape(batch_size, *output.shape[-2:])
+        if self.output_format == "yolov8":
+            output = output.transpose(0, 2, 1)
+            boxes = output[..., :4]
+            objectness = np.ones_like(output[..., :1])
+            scores = output[..., 4:]
+        else:
+            boxes = output[..., :4]
+            objectness = output[..., 4:5]
+            scores = output[..., 5:] * objectness
+
+        boxes = boxes / np.array([input_size, input_size] * 2, dtype=np.float32)
+        return np.concatenate([boxes, objectness, scores], axis=-1)
+
+
+BACKENDS = {
+    backend.name: backend
+    for backend in [
+        DetectorBackend(
+            "yolov3",
+            os.path.join(MODELS_DIR, "yolov3.weights"),
+            os.path.join(MODELS_DIR, "yolov3.cfg"),
+        ),
+        DetectorBackend(
+            "yolov3-tiny",
+            os.path.join(MODELS_DIR, "yolov3-tiny.weights"),
+            os.path.join(MODELS_DIR, "yolov3-tiny.cfg"),
+        ),
+        DetectorBackend(
+            "onnx",
+            os.environ.get(
+                "DETECTION_ONNX_MODEL", os.path.join(MODELS_DIR, "person_detector.onnx")
+            ),
+            classes_path=os.environ.get("DETECTION_ONNX_CLASSES", CLASSES_PATH),
+            input_size=640,
+            output_format=os.environ.get("DETECTION_ONNX_FORMAT", "yolov5"),
+            # ONNX exports usually have a fixed batch dimension of 1
+            max_batch_size=1,
+        ),
+    ]
+}
+
+
+def get_backend(name=None):
+    """Return the detector backend with the given name, or the configured default"""
+    name = name or DETECTION_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown detector backend: {name}")
+    return BACKENDS[name]
+
+
+def validate_input_size(input_size):
+    """Return `input_size` if it is a positive multiple of 32 up to the maximum"""
+    if (
+        isinstance(input_size, bool)
+        or not isinstance(input_size, int)
+        or input_size <= 0
+        or input_size % 32
+        or input_size > DETECTION_MAX_INPUT_SIZE
+    ):
+        raise ValueError(
+            "input_size must be a positive multiple of 32 up to "
+            f"{DETECTION_MAX_INPUT_SIZE}, got {input_size}"
+        )
+    return input_size
+
+
+def get_input_size(backend, input_size=None):
+    """Resolve the network input size for a call, falling back to the defaults"""
+    if input_size is None:
+        input_size = DETECTION_INPUT_SIZE or backend.input_size
+    return validate_input_size(input_size)
+
+
+def get_decode_max_dimension(detector=None, input_size=None):
+    """
+    Smallest longer side a frame may be decoded at for a detector call
+
+    Frames are squashed to the network input, so large JPEGs can be decoded at
+    a reduced resolution as long as they keep twice the input size.
+    """
+    return 2 * get_input_size(get_backend(detector), input_size)
+
+
+class ModelPool:
+    """
+    Bounded pool of loaded networks of one detector backend
+
+    A cv2.dnn.Net keeps per-inference state (input blob, layer buffers), so a
+    single instance must not be used by two threads at the same time. The pool
+    creates networks lazily, at most `size` of them, and hands each one out to
+    exactly one caller at a time.
+    """
+
+    def __init__(self, backend, size=None):
+        self.backend = backend
+        self.size = size or os.cpu_count() or 1
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.output_layers = None
+
+    def _load_net(self):
+        net = self.backend.load_net()
+        if self.output_layers is None:
+            self.output_layers = list(net.getUnconnectedOutLayersNames())
+        return net
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a network from the pool, blocking while all of them are busy"""
+        net = None
+        try:
+            net = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    self._created += 1
+                    try:
+                        net = self._load_net()
+                    except Exception:
+                        self._created -= 1
+                        raise
+        if net is None:
+            net = self._idle.get()
+
+        try:
+            yield net
+        finally:
+            self._idle.put(net)
+
+
+_registry_lock = threading.Lock()
+_model_pools = {}
+_class_lists = {}
+
+
+def get_model_pool(backend=None, size=None):
+    """
+    Return the process-wide pool for a detector backend, creating it on first use
+
+    `size` only applies when the pool is created and defaults to the CPU count.
+    """
+    backend = backend or get_backend()
+    with _registry_lock:
+        pool = _model_pools.get(backend.name)
+        if pool is None:
+            pool = ModelPool(backend, size)
+            _model_pools[backend.name] = pool
+        return pool
+
+
+def get_classes(classes_path=CLASSES_PATH):
+    """Return the class names for a model, read from disk only once per process"""
+    with _registry_lock:
+        classes = _class_lists.get(classes_path)
+        if classes is None:
+            with open(classes_path, "r") as f:
+                classes = [line.strip() for line in f.readlines()]
+            _class_lists[classes_path] = classes
+        return classes
+
+
+def get_person_class_id(classes_path=CLASSES_PATH):
+    """Return the index of the "person" class in the model's class list"""
+    return [label.lower() for label in get_classes(classes_path)].index("person")
@@ -0,0 +1,145 @@
+import glob
+import os
+
+import numpy as np
+import rasterio
+from rasterio.warp import transform as transform_points
+from rasterio.windows import Window
+
+# A GeoTIFF / VRT, or a directory of GeoTIFF tiles, e.g. SRTM or Copernicus DEM
+DEM_PATH = os.environ.get("DEM_PATH", os.path.join("data", "dem"))
+
+DEM_EXTENSIONS = ("*.tif", "*.tiff", "*.vrt")
+
+
+def dem_files(path=DEM_PATH):
+    """Return the DEM files at `path`, an empty list if there are none"""
+    if os.path.isdir(path):
+        return sorted(
+            file
+            for extension in DEM_EXTENSIONS
+            for file in glob.glob(os.path.join(path, extension))
+        )
+    return [path] if os.path.isfile(path) else []
+
+
+class DemElevation:
+    """
+    Elevations sampled from local DEM rasters
+
+    Every lookup only reads the window of each raster covering the requested
+    points and interpolates all points at once, so no raster is loaded as a
+    whole. Where tiles overlap, the first one (by file name) wins.
+
+    Args:
+        path: A DEM file or a directory of DEM tiles, DEM_PATH by default
+
+    Raises:
+        FileNotFoundError: If there is no DEM at `path`
+    """
+
+    def __init__(self, path=DEM_PATH):
+        files = dem_files(path)
+        if not files:
+            raise FileNotFoundError(f"No DEM files at {path}")
+        self.datasets = [rasterio.open(file) for file in files]
+
+    def close(self):
+        for dataset in self.datasets:
+            dataset.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def sample(self, lons, lats):
+        """
+        Bilinearly interpolated elevations at WGS84 coordinates
+
+        Args:
+            lons, lats: Arrays (or scalars) of the same shape
+
+        Returns:
+            np.ndarray: elevations in the DEM's unit, NaN outside of the DEM and
+                next to nodata cells
+        """
+        lons, lats = np.broadcast_arrays(
+            np.asarray(lons, dtype=float), np.asarray(lats, dtype=float)
+        )
+        shape = lons.shape
+        lons, lats = lons.ravel(), lats.ravel()
+        elevations = np.full(lons.shape, np.nan)
+        # Interpolate between the cells of one tile where possible, only then
+        # extend tiles by half a cell up to their edge, where tiles meet
+        for margin in (0.0, 0.5):
+            for dataset in self.datasets:
+                todo = np.flatnonzero(np.isnan(elevations))
+                if not len(todo):
+                    break
+                elevations[todo] = self._sample_dataset(
+                    dataset, lons[todo], lats[todo], margin
+                )
+        return elevations.reshape(shape)
+
+    def grid(self, bounds, size):
+        """
+        Elevations on a regular grid
+
+        Args:
+            bounds: [min_lon, min_lat, max_lon, max_lat]
+            size: Number of points along each axis
+
+        Returns:
+            np.ndarray: (size, size) elevations, rows from min_lat to max_lat
+        """
+        lons, lats = np.meshgrid(
+            np.linspace(bounds[0], bounds[2], size),
+            np.linspace(bounds[1], bounds[3], size),
+        )
+        return self.sample(lons, lats)
+
+    @staticmethod
+    def _sample_dataset(dataset, xs, ys, margin):
+        if dataset.crs is not None and not dataset.crs.is_geographic:
+            xs, ys = map(np.asarray, transform_points("EPSG:4326", dataset.crs, xs, ys))
+
+        # Fractional pixel positions relative to the cell centres
+        inverse = ~dataset.transform
+        cols = inverse.a * xs + inverse.b * ys + inverse.c - 0.5
+        rows = inverse.d * xs + inverse.e * ys + inverse.f - 0.5
+        values = np.full(xs.shape, np.nan)
+        # Points in the margin around the cell centres are clamped to the edge
+        inside = (
+            (cols >= -margin)
+            & (cols <= dataset.width - 1 + margin)
+            & (rows >= -margin)
+            & (rows <= dataset.height - 1 + margin)
+        )
+        if not inside.any():
+            return values
+        cols = np.clip(cols[inside], 0, dataset.width - 1)
+        rows = np.clip(rows[inside], 0, dataset.height - 1)
+
+        col0 = np.floor(cols).astype(int)
+        row0 = np.floor(rows).astype(int)
+        col1 = np.minimum(col0 + 1, dataset.width - 1)
+        row1 = np.minimum(row0 + 1, dataset.height - 1)
+
+        # Read only the cells around the points
+        col_off, row_off = col0.min(), row0.min()
+        window = Window(
+            col_off, row_off, col1.max() - col_off + 1, row1.max() - row_off + 1
+        )
+        data = dataset.read(1, window=window, masked=True)
+        data = data.astype(float).filled(np.nan)
+        col0, col1 = col0 - col_off, col1 - col_off
+        row0, row1 = row0 - row_off, row1 - row_off
+
+        col_weight = cols - np.floor(cols)
+        row_weight = rows - np.floor(rows)
+        top = data[row0, col0] * (1 - col_weight) + data[row0, col1] * col_weight
+        bottom = data[row1, col0] * (1 - col_weight) + data[row1, col1] * col_weight
+        values[inside] = top * (1 - row_weight) + bottom * row_weight
+        return values
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Messages buffered per subscriber before it is considered too slow
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", 256))
+# Seconds between keep-alive comments on idle streams
+EVENT_HEARTBEAT_INTERVAL = float(os.environ.get("EVENT_HEARTBEAT_INTERVAL", 15))
+
+# Sent to a subscriber that fell behind, after which its stream is closed
+RESET = b"event: reset\ndata: {}\n\n"
+
+
+def format_event(kind, data):
+    """Encode one Server-Sent Events message"""
+    return (
+        f"event: {kind}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+    )
+
+
+class EventBroker:
+    """
+    In-process pub/sub fan-out of change events to streaming clients
+
+    Every subscriber gets its own bounded queue and each message is encoded once
+    and shared by all of them, so publishing costs one put per subscriber and no
+    database access. A subscriber whose queue is full is dropped with a RESET
+    message, telling the client to reload its state and reconnect.
+
+    Must only be used from the event loop thread.
+    """
+
+    def __init__(self, queue_size=EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        # Last published values per (kind, id), to only send what changed
+        self._values = {}
+
+    @contextmanager
+    def subscribe(self, topic):
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers[topic].add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def publish(self, topic, message):
+        """Queue an encoded message for every subscriber of a topic"""
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return
+        for queue in list(subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESET)
+
+    def publish_changes(self, topic, kind, rows):
+        """
+        Publish the values that differ from the last ones published
+
+        Args:
+            topic: Topic to publish on, e.g. ("resort", 1)
+            kind: Event name and namespace of the row ids, e.g. "lifts"
+            rows: Dicts with an "id" and some or all of the current values
+        """
+        changed = []
+        for row in rows:
+            key = (kind, row["id"])
+            previous = self._values.get(key, {})
+            delta = {
+                name: value
+                for name, value in row.items()
+                if name != "id" and (name not in previous or previous[name] != value)
+            }
+            if delta:
+                self._values[key] = {**previous, **row}
+                changed.append({"id": row["id"], **delta})
+        if changed:
+            self.publish(topic, format_event(kind, changed))
+
+
+broker = EventBroker()
+
+
+async def stream(topic, heartbeat_interval=EVENT_HEARTBEAT_INTERVAL):
+    """Yield the encoded messages of a topic, with keep-alives while idle"""
+    with broker.subscribe(topic) as queue:
+        # Reconnect quickly after the stream is closed
+        yield b"retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), heartbeat_interval)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            yield message
+            if message is RESET:
+                return
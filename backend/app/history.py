@@ -0,0 +1,116 @@
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert
+
+from . import models
+
+# Rollup bucket sizes in seconds, by the name used in the history endpoint
+ROLLUP_STEPS = {"1m": 60, "15m": 15 * 60, "1h": 60 * 60}
+
+DAY = 24 * 60 * 60
+# How long raw samples and each rollup are kept, in seconds
+RAW_RETENTION = 2 * DAY
+ROLLUP_RETENTION = {60: 7 * DAY, 15 * 60: 90 * DAY, 60 * 60: 730 * DAY}
+
+
+def record_samples(db, samples):
+    """
+    Append queue samples and fold them into every rollup
+
+    Args:
+        db: SQLAlchemy session, committed by the caller
+        samples (list): dicts with lift_id, timestamp (unix seconds), people
+            and wait_time
+    """
+    if not samples:
+        return
+
+    # Only samples that were actually inserted are folded in, duplicates of a
+    # (lift_id, timestamp) already stored or earlier in `samples` are skipped
+    raw = models.LiftQueueSample
+    stmt = (
+        insert(raw)
+        .on_conflict_do_nothing()
+        .returning(raw.lift_id, raw.timestamp, raw.people, raw.wait_time)
+    )
+    inserted = db.execute(stmt, samples).mappings().all()
+    if not inserted:
+        return
+
+    rollups = []
+    for step in ROLLUP_STEPS.values():
+        for sample in inserted:
+            rollups.append(
+                {
+                    "lift_id": sample["lift_id"],
+                    "step": step,
+                    "bucket": sample["timestamp"] - sample["timestamp"] % step,
+                    "samples": 1,
+                    "people_sum": sample["people"],
+                    "people_max": sample["people"],
+                    "wait_time_sum": sample["wait_time"],
+                    "wait_time_max": sample["wait_time"],
+                }
+            )
+
+    rollup = models.LiftQueueRollup
+    stmt = insert(rollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[rollup.lift_id, rollup.step, rollup.bucket],
+        set_={
+            "samples": rollup.samples + stmt.excluded.samples,
+            "people_sum": rollup.people_sum + stmt.excluded.people_sum,
+            "people_max": func.max(rollup.people_max, stmt.excluded.people_max),
+            "wait_time_sum": rollup.wait_time_sum + stmt.excluded.wait_time_sum,
+            "wait_time_max": func.max(
+                rollup.wait_time_max, stmt.excluded.wait_time_max
+            ),
+        },
+    )
+    db.execute(stmt, rollups)
+
+
+def prune(db, now):
+    """Delete raw samples and rollups that are past their retention"""
+    db.execute(
+        delete(models.LiftQueueSample).where(
+            models.LiftQueueSample.timestamp < now - RAW_RETENTION
+        )
+    )
+    for step, retention in ROLLUP_RETENTION.items():
+        db.execute(
+            delete(models.LiftQueueRollup)
+            .where(models.LiftQueueRollup.step == step)
+            .where(models.LiftQueueRollup.bucket < now - retention)
+        )
+
+
+async def query_history(db, lift_id, start, end, step):
+    """
+    Read the pre-aggregated buckets of a lift between two unix timestamps
+
+    Args:
+        db: AsyncSession
+
+    Returns:
+        list: one dict per bucket with samples, average and maximum values
+    """
+    rollup = models.LiftQueueRollup
+    rows = await db.scalars(
+        select(rollup)
+        .where(rollup.lift_id == lift_id)
+        .where(rollup.step == step)
+        .where(rollup.bucket >= start - start % step)
+        .where(rollup.bucket < end)
+        .order_by(rollup.bucket)
+    )
+    return [
+        {
+            "timestamp": row.bucket,
+            "samples": row.samples,
+            "avg_people": row.people_sum / row.samples,
+            "max_people": row.people_max,
+            "avg_wait_time": row.wait_time_sum / row.samples,
+            "max_wait_time": row.wait_time_max,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import cv2
+
+from . import detectors
+
+# Number of worker processes running inference
+DETECTION_WORKERS = int(os.environ.get("DETECTION_WORKERS", os.cpu_count() or 1))
+# Requests allowed to wait or run at the same time before new ones are rejected
+DETECTION_QUEUE_SIZE = int(
+    os.environ.get("DETECTION_QUEUE_SIZE", DETECTION_WORKERS * 2)
+)
+# Seconds a request may wait for its result
+DETECTION_TIMEOUT = float(os.environ.get("DETECTION_TIMEOUT", 30))
+
+
+class DetectionQueueFull(Exception):
+    """Raised when the admission queue is saturated"""
+
+
+class DetectionUnavailable(Exception):
+    """Raised when the inference workers are not running"""
+
+
+def _init_worker(threads):
+    """Prepare a worker process: limit OpenCV threads and load the model up front"""
+    cv2.setNumThreads(threads)
+    try:
+        with detectors.get_model_pool(size=1).acquire():
+            pass
+    except Exception as e:
+        print(f"Warning: could not preload detection model: {str(e)}")
+
+
+class InferenceExecutor:
+    """
+    Runs CPU-bound detection in a process pool so the event loop stays free
+
+    At most `queue_size` jobs are admitted at once (running or waiting for a
+    worker); beyond that `run` fails fast with DetectionQueueFull instead of
+    letting requests pile up.
+    """
+
+    def __init__(self, workers, queue_size, timeout):
+        self.workers = max(1, workers)
+        self.queue_size = max(self.workers, queue_size)
+        self.timeout = timeout
+        self._executor = None
+        self._admitted = 0
+
+    def start(self):
+        threads = detectors.DETECTION_THREADS or max(
+            1, (os.cpu_count() or 1) // self.workers
+        )
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(threads,),
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    @property
+    def saturated(self):
+        return self._admitted >= self.queue_size
+
+    def _release(self):
+        self._admitted -= 1
+
+    def _restart(self, broken):
+        """Replace a broken pool, unless another request already replaced it"""
+        if self._executor is broken:
+            self.shutdown()
+            self.start()
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` in a worker process, enforcing admission and timeout"""
+        if self._executor is None:
+            raise DetectionUnavailable("Detection workers are not running")
+        if self.saturated:
+            raise DetectionQueueFull("Too many detection requests in progress")
+
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise DetectionUnavailable("Detection workers crashed, restarting")
+
+        # _admitted is only touched from the event loop thread. The slot is held
+        # until the job itself ends: a timed out request stops waiting, but its
+        # job keeps a worker busy until it finishes.
+        self._admitted += 1
+
+        def release(_):
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass  # the event loop is closed
+
+        future.add_done_callback(release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except BrokenProcessPool:
+            # A crashed worker (e.g. out of memory) breaks the whole pool
+            self._restart(executor)
+            raise DetectionUnavailable("Detection workers crashed, restarting")
+
+
+executor = InferenceExecutor(DETECTION_WORKERS, DETECTION_QUEUE_SIZE, DETECTION_TIMEOUT)
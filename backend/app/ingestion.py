@@ -0,0 +1,289 @@
+import asyncio
+import glob
+import math
+import os
+import random
+import time
+from urllib.parse import urlparse
+
+import requests
+from sqlalchemy import update
+
+from . import database
+from . import events
+from . import history
+from . import inference
+from . import models
+from . import motion
+from . import responses
+from .detectors import get_decode_max_dimension
+from .person_detection import count_people_from_bytes
+
+# Set to 0 to disable webcam polling
+INGESTION_ENABLED = os.environ.get("INGESTION_ENABLED", "1") != "0"
+# Seconds between two polls of the same lift camera
+INGESTION_INTERVAL = float(os.environ.get("INGESTION_INTERVAL", 60))
+# Relative random spread applied to every delay, e.g. 0.2 means +-20%
+INGESTION_JITTER = float(os.environ.get("INGESTION_JITTER", 0.2))
+# Cameras fetched and processed at the same time
+INGESTION_CONCURRENCY = int(os.environ.get("INGESTION_CONCURRENCY", 4))
+# Seconds between re-reading the list of open lifts with a webcam
+INGESTION_REFRESH_INTERVAL = float(os.environ.get("INGESTION_REFRESH_INTERVAL", 300))
+# Seconds between two batched database writes
+INGESTION_FLUSH_INTERVAL = float(os.environ.get("INGESTION_FLUSH_INTERVAL", 5))
+# Seconds between deleting queue history past its retention
+HISTORY_PRUNE_INTERVAL = 60 * 60
+
+INGESTION_CONFIDENCE_THRESHOLD = 0.01
+FETCH_TIMEOUT = 10
+MAX_BACKOFF_FACTOR = 16
+FRAME_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def fetch_frame(url, frame_index=0):
+    """
+    Fetch the current frame of a lift camera
+
+    Besides http(s) URLs, `url` may be a local file or directory (optionally as a
+    file:// URL). A directory stands in for a live camera by cycling through the
+    frames it contains, which is handy for development and tests.
+
+    Returns:
+        bytes: Encoded image
+    """
+    parsed = urlparse(url)
+    if parsed.scheme in ("http", "https"):
+        response = requests.get(url, timeout=FETCH_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    path = parsed.path if parsed.scheme == "file" else url
+    if os.path.isdir(path):
+        frames = sorted(
+            frame
+            for frame in glob.glob(os.path.join(path, "*"))
+            if frame.lower().endswith(FRAME_EXTENSIONS)
+        )
+        if not frames:
+            raise FileNotFoundError(f"No frames in {path}")
+        path = frames[frame_index % len(frames)]
+
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def estimate_wait_time(people, capacity):
+    """Estimate the wait in minutes from the queue length and the hourly capacity"""
+    if not capacity or capacity <= 0:
+        return 0
+    return math.ceil(people / (capacity / 60))
+
+
+class IngestionService:
+    """
+    Polls lift webcams in the background and stores people counts and wait times
+
+    Every open lift with a webcam gets its own polling task with a jittered
+    schedule that backs off on failures. A semaphore caps how many cameras are
+    processed at once, and results are collected and written in one
+    transaction every flush interval.
+    """
+
+    def __init__(
+        self,
+        interval=INGESTION_INTERVAL,
+        jitter=INGESTION_JITTER,
+        concurrency=INGESTION_CONCURRENCY,
+        refresh_interval=INGESTION_REFRESH_INTERVAL,
+        flush_interval=INGESTION_FLUSH_INTERVAL,
+    ):
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.refresh_interval = refresh_interval
+        self.flush_interval = flush_interval
+        self._semaphore = None
+        self._tasks = []
+        self._pollers = {}
+        self._pending = {}
+        self._samples = []
+        self._last_prune = 0
+
+    def _jittered(self, delay):
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def start(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._tasks = [
+            asyncio.create_task(self._schedule_loop()),
+            asyncio.create_task(self._writer_loop()),
+        ]
+
+    async def stop(self):
+        tasks = self._tasks + [task for task, _ in self._pollers.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._pollers = {}
+        await self.flush()
+
+    def _load_lifts(self):
+        db = database.SessionLocal()
+        try:
+            lifts = (
+                db.query(
+                    models.SkiLift.id,
+                    models.SkiLift.webcam_url,
+                    models.SkiLift.capacity,
+                    models.SkiLift.queue_roi,
+                    models.SkiLift.detector,
+                    models.SkiLift.detector_input_size,
+                )
+                .filter(models.SkiLift.status == "open")
+                .filter(models.SkiLift.webcam_url.isnot(None))
+                .filter(models.SkiLift.webcam_url != "")
+                .all()
+            )
+            return {
+                lift.id: (
+                    lift.webcam_url,
+                    lift.capacity,
+                    lift.queue_roi,
+                    lift.detector,
+                    lift.detector_input_size,
+                )
+                for lift in lifts
+            }
+        finally:
+            db.close()
+
+    async def _schedule_loop(self):
+        """Keep exactly one polling task per open lift with a webcam"""
+        while True:
+            try:
+                lifts = await asyncio.to_thread(self._load_lifts)
+            except Exception as e:
+                print(f"Error loading lifts for ingestion: {str(e)}")
+                lifts = None
+
+            if lifts is not None:
+                for lift_id, (task, config) in list(self._pollers.items()):
+                    if lifts.get(lift_id) != config:
+                        task.cancel()
+                        del self._pollers[lift_id]
+                        motion.gate.forget(("ingestion", lift_id))
+
+                for lift_id, config in lifts.items():
+                    if lift_id not in self._pollers:
+                        task = asyncio.create_task(self._poll_lift(lift_id, *config))
+                        self._pollers[lift_id] = (task, config)
+
+            await asyncio.sleep(self._jittered(self.refresh_interval))
+
+    async def _poll_lift(
+        self, lift_id, webcam_url, capacity, queue_roi, detector, input_size
+    ):
+        # Spread the first polls so cameras are not all hit at once
+        await asyncio.sleep(random.uniform(0, self.interval))
+
+        camera = ("ingestion", lift_id)
+        frame_index = 0
+        failures = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    frame = await asyncio.to_thread(
+                        fetch_frame, webcam_url, frame_index
+                    )
+                    frame_thumbnail = await asyncio.to_thread(motion.thumbnail, frame)
+                    people = motion.gate.lookup(camera, frame_thumbnail)
+                    if people is None:
+                        people = await inference.executor.run(
+                            count_people_from_bytes,
+                            frame,
+                            INGESTION_CONFIDENCE_THRESHOLD,
+                            get_decode_max_dimension(detector, input_size),
+                            queue_roi,
+                            detector,
+                            input_size,
+                        )
+                        motion.gate.store(camera, frame_thumbnail, people)
+                frame_index += 1
+                failures = 0
+                wait_time = estimate_wait_time(people, capacity)
+                self._pending[lift_id] = {
+                    "id": lift_id,
+                    "current_load": people,
+                    "wait_time": wait_time,
+                }
+                self._samples.append(
+                    {
+                        "lift_id": lift_id,
+                        "timestamp": int(time.time()),
+                        "people": people,
+                        "wait_time": wait_time,
+                    }
+                )
+            except inference.DetectionQueueFull:
+                # Interactive requests have priority, try again next round
+                pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                print(f"Error ingesting webcam of lift {lift_id}: {str(e)}")
+
+            backoff = min(2**failures, MAX_BACKOFF_FACTOR)
+            await asyncio.sleep(self._jittered(self.interval * backoff))
+
+    def _write(self, rows, samples):
+        now = int(time.time())
+        db = database.SessionLocal()
+        try:
+            db.execute(update(models.SkiLift), rows)
+            history.record_samples(db, samples)
+            if now - self._last_prune >= HISTORY_PRUNE_INTERVAL:
+                history.prune(db, now)
+                self._last_prune = now
+            lift_resorts = dict(
+                db.query(models.SkiLift.id, models.SkiLift.resort_id)
+                .filter(models.SkiLift.id.in_([row["id"] for row in rows]))
+                .all()
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        # Polling clients see the new wait times on their next request
+        responses.invalidate_lifts(*set(lift_resorts.values()))
+        return lift_resorts
+
+    async def flush(self):
+        """Write all collected results in a single transaction"""
+        if not self._pending:
+            return
+        rows, self._pending = list(self._pending.values()), {}
+        samples, self._samples = self._samples, []
+        try:
+            lift_resorts = await asyncio.to_thread(self._write, rows, samples)
+        except Exception as e:
+            print(f"Error writing {len(rows)} lift updates: {str(e)}")
+            return
+
+        # Push the new values to the resorts' streaming clients
+        by_resort = {}
+        for row in rows:
+            by_resort.setdefault(lift_resorts.get(row["id"]), []).append(row)
+        for resort_id, resort_rows in by_resort.items():
+            events.broker.publish_changes(("resort", resort_id), "lifts", resort_rows)
+
+    async def _writer_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+service = IngestionService()
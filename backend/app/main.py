@@ -1,119 +1,854 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.responses import FileResponse
-from typing import List
-import json
+from fastapi import FastAPI, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+import asyncio
+import base64
+import functools
+import hashlib
+from . import cache
 from . import database
+from . import detectors
+from . import events
+from . import history
+from . import inference
+from . import ingestion
 from . import models
+from . import motion
+from . import responses
 from . import schemas
+from . import static
+from . import tiles
 import os
-from sqlalchemy.orm import Session
-from .person_detection import detect_objects_from_base64
+from pydantic import TypeAdapter
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from .person_detection import (
+    detect_people_from_bytes,
+    detect_counts_batch,
+)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inference.executor.start()
+    if ingestion.INGESTION_ENABLED:
+        ingestion.service.start()
+    try:
+        yield
+    finally:
+        if ingestion.INGESTION_ENABLED:
+            await ingestion.service.stop()
+        inference.executor.shutdown()
+        await database.async_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
+
+RESORT_LIST = TypeAdapter(List[schemas.SkiResort])
+LIFT_LIST = TypeAdapter(List[schemas.SkiLift])
+HUT_LIST = TypeAdapter(List[schemas.SkiHut])
+RESORT_SNAPSHOT = TypeAdapter(schemas.ResortSnapshot)
+
+
+def _serialize(adapter, items):
+    """Validate ORM rows or dicts against a list schema and dump them as JSON"""
+    return adapter.dump_json(adapter.validate_python(items, from_attributes=True))
+
+
+async def run_detection(fn, *args):
+    """Run a detection function in the inference pool, mapping pool errors to HTTP"""
+    try:
+        return await inference.executor.run(fn, *args)
+    except inference.DetectionQueueFull as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": "1"}
+        )
+    except inference.DetectionUnavailable as e:
+        raise HTTPException(
+            status_code=503, detail=str(e), headers={"Retry-After": "5"}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Detection timed out")
 
 
 @app.get("/ski-resorts", response_model=List[schemas.SkiResort])
-def get_ski_resorts(db: Session = Depends(database.get_db)):
-    return db.query(models.SkiResort).all()
+async def get_ski_resorts(
+    request: Request, db: AsyncSession = Depends(database.get_async_db)
+):
+    async def build():
+        resorts = await db.scalars(select(models.SkiResort))
+        return _serialize(RESORT_LIST, resorts.all())
+
+    return await responses.cached_response(request, ("resorts",), build)
 
 
 @app.get("/ski-resorts/{resort_id}", response_model=schemas.SkiResort)
-def get_ski_resort(resort_id: int, db: Session = Depends(database.get_db)):
-    resort = db.query(models.SkiResort).filter(models.SkiResort.id == resort_id).first()
+async def get_ski_resort(
+    resort_id: int, db: AsyncSession = Depends(database.get_async_db)
+):
+    resort = await db.get(models.SkiResort, resort_id)
     if resort is None:
         raise HTTPException(status_code=404, detail="Ski resort not found")
     return resort
 
 
 @app.post("/ski-resorts", response_model=schemas.SkiResort)
-def create_ski_resort(
-    resort: schemas.SkiResortBase, db: Session = Depends(database.get_db)
+async def create_ski_resort(
+    resort: schemas.SkiResortBase, db: AsyncSession = Depends(database.get_async_db)
 ):
     db_resort = models.SkiResort(**resort.dict())
     db.add(db_resort)
-    db.commit()
-    db.refresh(db_resort)
+    await db.commit()
+    responses.invalidate(("resorts",))
     return db_resort
 
 
 @app.put("/ski-resorts/{resort_id}", response_model=schemas.SkiResort)
-def update_ski_resort(
+async def update_ski_resort(
     resort_id: int,
     resort: schemas.SkiResortBase,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
 ):
-    db_resort = (
-        db.query(models.SkiResort).filter(models.SkiResort.id == resort_id).first()
-    )
+    db_resort = await db.get(models.SkiResort, resort_id)
     if db_resort is None:
         raise HTTPException(status_code=404, detail="Ski resort not found")
 
     for key, value in resort.dict().items():
         setattr(db_resort, key, value)
 
-    db.commit()
-    db.refresh(db_resort)
+    await db.commit()
+    responses.invalidate(("resorts",), ("snapshot", resort_id))
     return db_resort
 
 
 @app.delete("/ski-resorts/{resort_id}")
-def delete_ski_resort(resort_id: int, db: Session = Depends(database.get_db)):
-    db_resort = (
-        db.query(models.SkiResort).filter(models.SkiResort.id == resort_id).first()
+async def delete_ski_resort(
+    resort_id: int, db: AsyncSession = Depends(database.get_async_db)
+):
+    # Lifts and huts are detached from the resort on delete, so load them up
+    # front; an async session cannot lazy load them during the flush
+    db_resort = await db.get(
+        models.SkiResort,
+        resort_id,
+        options=[
+            selectinload(models.SkiResort.ski_lifts),
+            selectinload(models.SkiResort.huts),
+        ],
     )
     if db_resort is None:
         raise HTTPException(status_code=404, detail="Ski resort not found")
 
-    db.delete(db_resort)
-    db.commit()
+    await db.delete(db_resort)
+    await db.commit()
+    lift_path_cache.delete(resort_id)
+    responses.invalidate_resort(resort_id)
     return {"message": "Ski resort deleted successfully"}
 
 
+LIFT_STATUSES = {"open", "closed", "hold"}
+LIFT_TELEMETRY_FIELDS = ["current_load", "wait_time", "status"]
+
+
+def _lift_telemetry_error(row):
+    if row.status is not None and row.status not in LIFT_STATUSES:
+        return f"Unknown status, use one of {', '.join(sorted(LIFT_STATUSES))}"
+    if any(
+        value is not None and value < 0 for value in (row.current_load, row.wait_time)
+    ):
+        return "current_load and wait_time must not be negative"
+    return None
+
+
+def _bulk_update(table, fields):
+    """
+    UPDATE statement for executemany with one parameter set per row
+
+    A NULL parameter keeps the stored value, so rows updating different fields
+    still share one statement.
+    """
+    return (
+        update(table)
+        .where(table.c.id == bindparam("row_id"))
+        .values(
+            {
+                field: func.coalesce(bindparam(f"new_{field}"), table.c[field])
+                for field in fields
+            }
+        )
+    )
+
+
+LIFT_TELEMETRY_UPDATE = _bulk_update(models.SkiLift.__table__, LIFT_TELEMETRY_FIELDS)
+HUT_TELEMETRY_UPDATE = _bulk_update(models.SkiHut.__table__, ["free_seats"])
+
+
+@app.patch(
+    "/ski-resorts/{resort_id}/telemetry", response_model=schemas.TelemetryResponse
+)
+async def update_resort_telemetry(
+    resort_id: int,
+    telemetry: schemas.TelemetryUpdate,
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """
+    Update live lift and hut values of a resort in one transaction
+
+    Rows that are invalid or not part of the resort are skipped and reported,
+    the others are applied with one executemany statement per table.
+    """
+    lift_ids = set(
+        await db.scalars(
+            select(models.SkiLift.id)
+            .where(models.SkiLift.resort_id == resort_id)
+            .where(models.SkiLift.id.in_({row.lift_id for row in telemetry.lifts}))
+        )
+    )
+    hut_ids = set(
+        await db.scalars(
+            select(models.SkiHut.id)
+            .where(models.SkiHut.resort_id == resort_id)
+            .where(models.SkiHut.id.in_({row.hut_id for row in telemetry.huts}))
+        )
+    )
+
+    lift_results = []
+    lift_rows = []
+    for row in telemetry.lifts:
+        error = (
+            "Ski lift not found"
+            if row.lift_id not in lift_ids
+            else _lift_telemetry_error(row)
+        )
+        lift_results.append(
+            {"id": row.lift_id, "updated": error is None, "error": error}
+        )
+        if error is None:
+            lift_rows.append(
+                {
+                    "row_id": row.lift_id,
+                    **{
+                        f"new_{field}": getattr(row, field)
+                        for field in LIFT_TELEMETRY_FIELDS
+                    },
+                }
+            )
+
+    hut_results = []
+    hut_rows = []
+    for row in telemetry.huts:
+        error = None
+        if row.hut_id not in hut_ids:
+            error = "Ski hut not found"
+        elif row.free_seats < 0:
+            error = "free_seats must not be negative"
+        hut_results.append({"id": row.hut_id, "updated": error is None, "error": error})
+        if error is None:
+            hut_rows.append({"row_id": row.hut_id, "new_free_seats": row.free_seats})
+
+    if lift_rows:
+        await db.execute(LIFT_TELEMETRY_UPDATE, lift_rows)
+    if hut_rows:
+        await db.execute(HUT_TELEMETRY_UPDATE, hut_rows)
+    await db.commit()
+
+    topic = ("resort", resort_id)
+    if lift_rows:
+        responses.invalidate_lifts(resort_id)
+        events.broker.publish_changes(
+            topic,
+            "lifts",
+            [
+                {
+                    "id": row["row_id"],
+                    **{
+                        field: row[f"new_{field}"]
+                        for field in LIFT_TELEMETRY_FIELDS
+                        if row[f"new_{field}"] is not None
+                    },
+                }
+                for row in lift_rows
+            ],
+        )
+    if hut_rows:
+        responses.invalidate_huts(resort_id)
+        events.broker.publish_changes(
+            topic,
+            "huts",
+            [
+                {"id": row["row_id"], "free_seats": row["new_free_seats"]}
+                for row in hut_rows
+            ],
+        )
+
+    return {"lifts": lift_results, "huts": hut_results}
+
+
 @app.get("/ski-maps/{map_file}")
-def get_ski_map(map_file: str):
-    map_path = os.path.join("data", "ski-maps", map_file)
-    if not os.path.exists(map_path):
+def get_ski_map(map_file: str, request: Request):
+    try:
+        return static.serve_file(request, os.path.join("data", "ski-maps", map_file))
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Ski map not found")
-    return FileResponse(map_path)
+
+
+# Decoded lift paths per resort; paths only change when the map is regenerated,
+# which the loader does in its own process. Entries expire with the cached
+# responses they are served in, so new lift rows are not paired with old paths.
+lift_path_cache = cache.LRUCache(
+    max_entries=int(os.environ.get("LIFT_PATH_CACHE_RESORTS", 256)),
+    ttl=float(os.environ.get("LIFT_PATH_CACHE_TTL", responses.RESPONSE_CACHE_TTL)),
+)
+LIFT_COLUMNS = [
+    getattr(models.SkiLift, field)
+    for field in schemas.SkiLift.model_fields
+    if field != "path"
+]
+
+
+async def _resort_lift_paths(db, resort_id, lift_ids=()):
+    """
+    Return {lift_id: path} for a resort, decoding the stored paths only once
+
+    The cached paths are reloaded unless they belong to exactly the lifts in
+    `lift_ids`, i.e. when lifts were added or removed since they were cached.
+    """
+    paths = lift_path_cache.get(resort_id)
+    if paths is None or paths.keys() != set(lift_ids):
+        result = await db.execute(
+            select(models.SkiLift.id, models.SkiLift.path).where(
+                models.SkiLift.resort_id == resort_id
+            )
+        )
+        paths = dict(result.all())
+        lift_path_cache.set(resort_id, paths)
+    return paths
 
 
 @app.get("/ski-resorts/{resort_id}/lifts", response_model=List[schemas.SkiLift])
-def get_resort_lifts(resort_id: int, db: Session = Depends(database.get_db)):
-    lifts = db.query(models.SkiLift).filter(models.SkiLift.resort_id == resort_id).all()
-    for lift in lifts:
-        lift.path = json.loads(lift.path)
-    return lifts
+async def get_resort_lifts(
+    resort_id: int,
+    request: Request,
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    async def build():
+        return _serialize(LIFT_LIST, await _lifts(db, resort_id))
+
+    return await responses.cached_response(request, ("lifts", resort_id), build)
+
+
+async def _lifts(db, resort_id):
+    # Only the live columns are read per request, the paths come from the cache
+    result = await db.execute(
+        select(*LIFT_COLUMNS).where(models.SkiLift.resort_id == resort_id)
+    )
+    rows = result.all()
+    paths = await _resort_lift_paths(db, resort_id, [row.id for row in rows])
+    return [{**row._asdict(), "path": paths[row.id]} for row in rows]
+
+
+@app.get("/ski-resorts/{resort_id}/snapshot", response_model=schemas.ResortSnapshot)
+async def get_resort_snapshot(
+    resort_id: int,
+    request: Request,
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    """Everything the resort page shows, loaded and serialized in one go"""
+
+    async def build():
+        # Paths are served from the path cache, so they are not loaded here
+        resort = await db.get(
+            models.SkiResort,
+            resort_id,
+            options=[
+                selectinload(models.SkiResort.ski_lifts).defer(models.SkiLift.path),
+                selectinload(models.SkiResort.huts),
+            ],
+        )
+        if resort is None:
+            raise HTTPException(status_code=404, detail="Ski resort not found")
+
+        paths = await _resort_lift_paths(
+            db, resort_id, [lift.id for lift in resort.ski_lifts]
+        )
+        lifts = [
+            {
+                **{column.key: getattr(lift, column.key) for column in LIFT_COLUMNS},
+                "path": paths[lift.id],
+            }
+            for lift in resort.ski_lifts
+        ]
+        wait_times = [
+            lift["wait_time"]
+            for lift in lifts
+            if lift["status"] == "open" and lift["wait_time"] is not None
+        ]
+        snapshot = {
+            "resort": resort,
+            "lifts": lifts,
+            "huts": resort.huts,
+            "map_url": f"/ski-resorts/{resort_id}/map",
+            "total_lifts": len(lifts),
+            "open_lifts": sum(lift["status"] == "open" for lift in lifts),
+            "average_wait_time": (
+                sum(wait_times) / len(wait_times) if wait_times else None
+            ),
+            "max_wait_time": max(wait_times, default=None),
+        }
+        return RESORT_SNAPSHOT.dump_json(
+            RESORT_SNAPSHOT.validate_python(snapshot, from_attributes=True)
+        )
+
+    return await responses.cached_response(request, ("snapshot", resort_id), build)
+
+
+@app.get("/ski-resorts/{resort_id}/events")
+async def stream_resort_events(resort_id: int):
+    """
+    Server-Sent Events stream of lift and hut changes of a resort
+
+    Each "lifts" or "huts" event carries a list of {"id", ...changed values}.
+    Clients load the snapshot first and apply the deltas on top; after a
+    "reset" event they reload the snapshot and reconnect.
+    """
+    return StreamingResponse(
+        events.stream(("resort", resort_id)),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _unix_seconds(value):
+    # Timestamps without a zone are taken as UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+@app.get(
+    "/ski-resorts/{resort_id}/lifts/{lift_id}/history",
+    response_model=schemas.LiftHistory,
+)
+async def get_lift_history(
+    resort_id: int,
+    lift_id: int,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    step: str = "15m",
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    if step not in history.ROLLUP_STEPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown step, use one of {', '.join(history.ROLLUP_STEPS)}",
+        )
+
+    lift = await db.scalar(
+        select(models.SkiLift.id)
+        .where(models.SkiLift.id == lift_id)
+        .where(models.SkiLift.resort_id == resort_id)
+    )
+    if lift is None:
+        raise HTTPException(status_code=404, detail="Ski lift not found")
+
+    end = end or datetime.now(timezone.utc)
+    start = start or end - timedelta(days=1)
+    buckets = await history.query_history(
+        db,
+        lift_id,
+        _unix_seconds(start),
+        _unix_seconds(end),
+        history.ROLLUP_STEPS[step],
+    )
+    return {"lift_id": lift_id, "step": step, "buckets": buckets}
 
 
 @app.get("/ski-resorts/{resort_id}/map")
-def get_resort_map(resort_id: int):
-    map_path = os.path.join("data", f"ski_map_{resort_id}.png")
-    if not os.path.exists(map_path):
+def get_resort_map(resort_id: int, request: Request):
+    try:
+        return static.serve_file(
+            request, os.path.join("data", f"ski_map_{resort_id}.png")
+        )
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Ski map not found")
-    return FileResponse(map_path)
 
 
-@app.post("/detect-people")
-async def detect_people(image: dict):
+# Tiles only change when the loader re-renders a map, which also changes the
+# version in their URLs, so versioned tiles can be kept for long
+TILE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@app.get("/ski-resorts/{resort_id}/tiles")
+def get_resort_tiles(resort_id: int):
+    """Describe the tile pyramid of a resort map (zoom levels, sizes, format)"""
+    metadata = tiles.read_metadata(resort_id)
+    if metadata is None:
+        raise HTTPException(status_code=404, detail="Map tiles not found")
+    return metadata
+
+
+@app.get("/ski-resorts/{resort_id}/tiles/{z}/{x}/{y}")
+def get_resort_tile(
+    resort_id: int, z: int, x: int, y: int, request: Request, v: Optional[str] = None
+):
+    """
+    Serve one map tile with ETag revalidation
+
+    Tiles requested with the current `v` of tiles.json may be cached for long.
+    Unversioned or outdated requests must revalidate, since a re-render
+    replaces the tiles under the same path.
+    """
+    tile = tiles.find_tile(resort_id, z, x, y)
+    if tile is None:
+        raise HTTPException(status_code=404, detail="Map tile not found")
+    path, media_type = tile
+    cache_control = "no-cache"
+    if v is not None:
+        metadata = tiles.read_metadata(resort_id)
+        if metadata is not None and metadata.get("version") == v:
+            cache_control = TILE_CACHE_CONTROL
     try:
-        if "base64" not in image:
-            raise HTTPException(status_code=400, detail="No base64 image provided")
+        return static.serve_file(request, path, media_type, cache_control)
+    except FileNotFoundError:
+        # Removed by a re-render since it was found
+        raise HTTPException(status_code=404, detail="Map tile not found")
+
+
+# Identical frames (same bytes and options) are answered from memory
+detection_cache = cache.LRUCache(
+    max_entries=int(os.environ.get("DETECTION_CACHE_ENTRIES", 1024)),
+    max_bytes=int(os.environ.get("DETECTION_CACHE_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.environ.get("DETECTION_CACHE_TTL", 30)),
+)
 
-        base64_image = image["base64"]
-        confidence_threshold = image.get("confidence_threshold", 0.01)
 
-        # Process image
-        annotated_image, counts = detect_objects_from_base64(
-            base64_image, confidence_threshold
+def _frame_digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _result_size(result):
+    """Rough memory footprint of a cached detection result in bytes"""
+    return (
+        256
+        + len(result.get("annotated_image") or "")
+        + 128 * len(result.get("detections", []))
+    )
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ("1", "true", "yes", "on")
+
+
+# Largest annotated image a request may ask for, in pixels of the longest side
+DETECTION_MAX_IMAGE_SIZE = int(os.environ.get("DETECTION_MAX_IMAGE_SIZE", 4096))
+# Frames of one batch request, which takes a single admission slot
+DETECTION_BATCH_MAX_FRAMES = int(os.environ.get("DETECTION_BATCH_MAX_FRAMES", 64))
+
+
+def _validate_confidence_threshold(confidence_threshold):
+    if not 0 <= confidence_threshold <= 1:
+        raise ValueError(
+            f"confidence_threshold must be between 0 and 1, got {confidence_threshold}"
         )
 
-        return {"annotated_image": annotated_image, "counts": counts}
 
+def _validate_detection_options(options):
+    """Raise ValueError for option values the detector cannot handle"""
+    _validate_confidence_threshold(options["confidence_threshold"])
+    if options["input_size"] is not None:
+        detectors.validate_input_size(options["input_size"])
+    image_max_size = options["image_max_size"]
+    if (
+        image_max_size is not None
+        and not 0 < image_max_size <= DETECTION_MAX_IMAGE_SIZE
+    ):
+        raise ValueError(
+            f"image_max_size must be between 1 and {DETECTION_MAX_IMAGE_SIZE}, "
+            f"got {image_max_size}"
+        )
+    if not 0 <= options["image_quality"] <= 100:
+        raise ValueError(
+            f"image_quality must be between 0 and 100, got {options['image_quality']}"
+        )
+
+
+# Options of /detect-people that may also be sent as JSON or form fields
+DETECTION_OPTIONS = {
+    "confidence_threshold": float,
+    "camera_id": str,
+    "detector": str,
+    "input_size": int,
+    "annotate": _parse_bool,
+    "image_quality": int,
+    "image_max_size": int,
+}
+
+
+@app.post(
+    "/detect-people",
+    response_model=schemas.DetectionResponse,
+    response_model_exclude_none=True,
+)
+async def detect_people(
+    request: Request,
+    confidence_threshold: float = 0.01,
+    camera_id: Optional[str] = None,
+    detector: Optional[str] = None,
+    input_size: Optional[int] = None,
+    annotate: bool = False,
+    image_quality: int = 80,
+    image_max_size: Optional[int] = None,
+):
+    """
+    Detect people in an image sent as JSON (`{"base64": ...}`), as a multipart
+    form with an `image` file field, or as a raw `image/*` body. Options can be
+    given as query parameters or as fields of the JSON body or form.
+
+    The response holds the counts and the detected boxes. An annotated JPEG is
+    only rendered with `annotate`, at `image_quality` and shrunk to at most
+    `image_max_size` pixels.
+
+    `detector` and `input_size` pick the detector backend and network input size
+    instead of the deployment defaults.
+
+    With a `camera_id`, frames in which the scene has not changed since the last
+    detection for that camera reuse its result; `fresh` is false in that case.
+    """
+    options = {
+        "confidence_threshold": confidence_threshold,
+        "camera_id": camera_id,
+        "detector": detector,
+        "input_size": input_size,
+        "annotate": annotate,
+        "image_quality": image_quality,
+        "image_max_size": image_max_size,
+    }
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("image")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="No image file provided")
+            image_bytes = await upload.read()
+            fields = form
+        elif content_type.startswith("image/"):
+            image_bytes = await request.body()
+            fields = {}
+        else:
+            try:
+                image = await request.json()
+                if not isinstance(image, dict) or "base64" not in image:
+                    raise HTTPException(
+                        status_code=400, detail="No base64 image provided"
+                    )
+                image_bytes = base64.b64decode(image["base64"], validate=True)
+            except (ValueError, TypeError) as e:
+                # Also binascii.Error and JSONDecodeError, both ValueErrors
+                raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+            fields = image
+
+        if not image_bytes:
+            raise HTTPException(status_code=400, detail="Empty image provided")
+        try:
+            for name, parse in DETECTION_OPTIONS.items():
+                if fields.get(name) is not None:
+                    options[name] = parse(fields[name])
+            detectors.get_backend(options["detector"])
+            _validate_detection_options(options)
+        except (ValueError, TypeError) as e:
+            # TypeError for non-scalar values such as lists
+            raise HTTPException(status_code=400, detail=str(e))
+
+        camera_id = options.pop("camera_id")
+        cache_key = ("detect", _frame_digest(image_bytes), *options.values())
+        result = detection_cache.get(cache_key)
+        if result is None and camera_id is not None:
+            camera = ("camera", camera_id, *options.values())
+            try:
+                frame_thumbnail = await asyncio.to_thread(motion.thumbnail, image_bytes)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid image: {e}")
+            result = motion.gate.lookup(camera, frame_thumbnail)
+
+        fresh = result is None
+        if fresh:
+            # Process image
+            result = await run_detection(
+                functools.partial(
+                    detect_people_from_bytes,
+                    max_dimension=detectors.get_decode_max_dimension(
+                        options["detector"], options["input_size"]
+                    ),
+                    **options,
+                ),
+                image_bytes,
+            )
+            if camera_id is not None:
+                motion.gate.store(camera, frame_thumbnail, result, _result_size(result))
+            detection_cache.set(cache_key, result, _result_size(result))
+
+        return {**result, "fresh": fresh}
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        # The image could not be decoded
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/detect-people/batch", response_model=schemas.BatchDetectionResponse)
+async def detect_people_batch(
+    request: schemas.BatchDetectionRequest,
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    if not request.frames:
+        raise HTTPException(status_code=400, detail="No frames provided")
+    if len(request.frames) > DETECTION_BATCH_MAX_FRAMES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {DETECTION_BATCH_MAX_FRAMES} frames per batch, "
+            f"got {len(request.frames)}",
+        )
+
+    # Frames of lifts with a queue ROI are only searched inside that region, and
+    # lifts may pick their own detector unless the request overrides it
+    result = await db.execute(
+        select(
+            models.SkiLift.id,
+            models.SkiLift.queue_roi,
+            models.SkiLift.detector,
+            models.SkiLift.detector_input_size,
+        ).where(models.SkiLift.id.in_({frame.lift_id for frame in request.frames}))
+    )
+    lifts = {lift.id: lift for lift in result.all()}
+    rois = []
+    settings = []
+    for frame in request.frames:
+        lift = lifts.get(frame.lift_id)
+        rois.append(lift.queue_roi if lift and lift.queue_roi else None)
+        settings.append(
+            (
+                request.detector or (lift.detector if lift else None),
+                request.input_size
+                if request.input_size is not None
+                else (lift.detector_input_size if lift else None),
+            )
+        )
+    try:
+        _validate_confidence_threshold(request.confidence_threshold)
+        for detector, input_size in set(settings):
+            detectors.get_backend(detector)
+            if input_size is not None:
+                detectors.validate_input_size(input_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        images_data = [
+            base64.b64decode(frame.base64, validate=True) for frame in request.frames
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error decoding images: {e}")
+
+    # Frames seen before are answered from the cache, and only frames whose
+    # scene changed since the last detection go to the network. Both are keyed
+    # on everything that affects the counts, so a changed ROI or detector of a
+    # lift is never answered with counts of the old one.
+    roi_keys = [tuple(map(tuple, roi)) if roi else None for roi in rois]
+    cache_keys = [
+        (
+            "batch",
+            _frame_digest(data),
+            request.confidence_threshold,
+            roi_key,
+            *options,
+        )
+        for data, roi_key, options in zip(images_data, roi_keys, settings)
+    ]
+    cameras = [
+        ("lift", frame.lift_id, request.confidence_threshold, roi_key, *options)
+        for frame, roi_key, options in zip(request.frames, roi_keys, settings)
+    ]
+    counts = [detection_cache.get(cache_key) for cache_key in cache_keys]
+
+    # Cache hits are answered without decoding, only the other frames get a
+    # thumbnail for the motion gate
+    missed = [i for i, frame_counts in enumerate(counts) if frame_counts is None]
+    try:
+        thumbnails = await asyncio.to_thread(
+            lambda: {i: motion.thumbnail(images_data[i]) for i in missed}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error decoding images: {e}")
+    for i in missed:
+        counts[i] = motion.gate.lookup(cameras[i], thumbnails[i])
+    changed = [i for i in missed if counts[i] is None]
+
+    # One batched job per detector configuration
+    groups = {}
+    for i in changed:
+        groups.setdefault(settings[i], []).append(i)
+
+    try:
+        groups_counts = await asyncio.gather(
+            *(
+                run_detection(
+                    detect_counts_batch,
+                    [images_data[i] for i in indices],
+                    request.confidence_threshold,
+                    detectors.get_decode_max_dimension(detector, input_size),
+                    [rois[i] for i in indices],
+                    detector,
+                    input_size,
+                )
+                for (detector, input_size), indices in groups.items()
+            )
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    for indices, group_counts in zip(groups.values(), groups_counts):
+        for i, frame_counts in zip(indices, group_counts):
+            counts[i] = frame_counts
+            motion.gate.store(cameras[i], thumbnails[i], frame_counts, _result_size({}))
+            detection_cache.set(cache_keys[i], frame_counts, _result_size({}))
+
+    changed = set(changed)
+    return {
+        "results": [
+            {"lift_id": frame.lift_id, "counts": frame_counts, "fresh": i in changed}
+            for i, (frame, frame_counts) in enumerate(zip(request.frames, counts))
+        ]
+    }
+
+
+@app.get("/detect-people/cache")
+def get_detection_cache_stats():
+    return detection_cache.stats()
+
+
 @app.get("/ski-resorts/{resort_id}/huts", response_model=List[schemas.SkiHut])
-def get_resort_huts(resort_id: int, db: Session = Depends(database.get_db)):
-    huts = db.query(models.SkiHut).filter(models.SkiHut.resort_id == resort_id).all()
-    return huts
+async def get_resort_huts(
+    resort_id: int,
+    request: Request,
+    db: AsyncSession = Depends(database.get_async_db),
+):
+    async def build():
+        huts = await db.scalars(
+            select(models.SkiHut).where(models.SkiHut.resort_id == resort_id)
+        )
+        return _serialize(HUT_LIST, huts.all())
+
+    return await responses.cached_response(request, ("huts", resort_id), build)
@@ -1,10 +1,38 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Float
+import json
+
+import numpy as np
+from sqlalchemy import JSON, Column, Integer, String, ForeignKey, Float, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 
 Base = declarative_base()
 
 
+class PackedPath(TypeDecorator):
+    """
+    List of [x, y] points stored as packed little-endian float32 pairs
+
+    Decoding is a single buffer copy instead of parsing a JSON string. Rows
+    written before paths were packed still hold JSON text and are read as such.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return np.asarray(value, dtype="<f4").reshape(-1, 2).tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            return json.loads(value)
+        return np.frombuffer(value, dtype="<f4").reshape(-1, 2).tolist()
+
+
 class SkiLift(Base):
     __tablename__ = "ski_lifts"
 
@@ -19,8 +47,13 @@ class SkiLift(Base):
     status = Column(String)  # 'open', 'closed', 'hold'
     type = Column(String)  # 'express', 'quad', 'magic-carpet'
     difficulty = Column(String)  # 'beginner', 'intermediate', 'advanced'
-    path = Column(String)  # JSON string of coordinates
+    path = Column(PackedPath)  # [x, y] map pixel coordinates
     wait_time = Column(Integer)
+    queue_roi = Column(JSON)  # polygon of [x, y] webcam pixel coordinates
+    detector = Column(String)  # 'yolov3', 'yolov3-tiny', 'onnx' or NULL for default
+    detector_input_size = Column(Integer)
+    bottom_elevation = Column(Float)  # in m, of the lower end of the path
+    top_elevation = Column(Float)
 
     ski_resort = relationship("SkiResort", back_populates="ski_lifts")
 
@@ -57,3 +90,31 @@ class SkiHut(Base):
     elevation = Column(Float)
 
     resort = relationship("SkiResort", back_populates="huts")
+
+
+class LiftQueueSample(Base):
+    """Raw people count of a lift queue, appended on every webcam detection"""
+
+    __tablename__ = "lift_queue_samples"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    lift_id = Column(Integer, ForeignKey("ski_lifts.id"), primary_key=True)
+    timestamp = Column(Integer, primary_key=True)  # unix seconds
+    people = Column(Integer)
+    wait_time = Column(Integer)
+
+
+class LiftQueueRollup(Base):
+    """Pre-aggregated queue samples per lift for a fixed bucket size"""
+
+    __tablename__ = "lift_queue_rollups"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    lift_id = Column(Integer, ForeignKey("ski_lifts.id"), primary_key=True)
+    step = Column(Integer, primary_key=True)  # bucket size in seconds
+    bucket = Column(Integer, primary_key=True)  # unix seconds of the bucket start
+    samples = Column(Integer)
+    people_sum = Column(Integer)
+    people_max = Column(Integer)
+    wait_time_sum = Column(Integer)
+    wait_time_max = Column(Integer)
@@ -0,0 +1,88 @@
+import os
+
+import cv2
+import numpy as np
+
+from .cache import LRUCache
+
+# Fraction of thumbnail pixels that must change before a frame counts as new
+MOTION_THRESHOLD = float(os.environ.get("MOTION_THRESHOLD", 0.01))
+# Grayscale difference (0-255) above which a thumbnail pixel counts as changed
+MOTION_PIXEL_DELTA = int(os.environ.get("MOTION_PIXEL_DELTA", 20))
+# Seconds after which a result is recomputed even if nothing moved
+MOTION_MAX_AGE = float(os.environ.get("MOTION_MAX_AGE", 600))
+# Cameras remembered at most, and the total size of their thumbnails and results
+MOTION_MAX_CAMERAS = int(os.environ.get("MOTION_MAX_CAMERAS", 1024))
+MOTION_CACHE_BYTES = int(os.environ.get("MOTION_CACHE_BYTES", 32 * 1024 * 1024))
+THUMBNAIL_SIZE = (64, 48)
+
+
+def thumbnail(data):
+    """
+    Decode encoded image bytes into a small, blurred grayscale thumbnail
+
+    JPEGs are decoded at 1/8 resolution, so this costs a fraction of a full decode.
+    """
+    image = cv2.imdecode(
+        np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8
+    )
+    if image is None:
+        raise ValueError("Could not decode image")
+    image = cv2.resize(image, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+    # Blur away sensor noise and JPEG artifacts
+    return cv2.GaussianBlur(image, (3, 3), 0)
+
+
+class MotionGate:
+    """
+    Remembers the last detection result per camera and whether the scene changed
+
+    Each camera keeps the thumbnail of the frame its result was computed from.
+    A new frame whose thumbnail differs in less than `threshold` of its pixels
+    reuses that result instead of running inference again.
+
+    Camera keys come from clients, so the entries live in an LRU bounded by
+    count and size, and expire after `max_age`.
+    """
+
+    def __init__(
+        self,
+        threshold=MOTION_THRESHOLD,
+        pixel_delta=MOTION_PIXEL_DELTA,
+        max_age=MOTION_MAX_AGE,
+        max_cameras=MOTION_MAX_CAMERAS,
+        max_bytes=MOTION_CACHE_BYTES,
+    ):
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.max_age = max_age
+        self._cameras = LRUCache(
+            max_entries=max_cameras, max_bytes=max_bytes, ttl=max_age
+        )
+
+    def changed_fraction(self, previous, current):
+        diff = cv2.absdiff(previous, current)
+        return np.count_nonzero(diff > self.pixel_delta) / diff.size
+
+    def lookup(self, camera, frame_thumbnail):
+        """Return the stored result if the scene is unchanged, otherwise None"""
+        entry = self._cameras.get(camera)
+        if entry is None:
+            return None
+
+        previous, result = entry
+        if self.changed_fraction(previous, frame_thumbnail) >= self.threshold:
+            return None
+        return result
+
+    def store(self, camera, frame_thumbnail, result, size=0):
+        """Remember a result; `size` is its approximate size in bytes"""
+        self._cameras.set(
+            camera, (frame_thumbnail, result), frame_thumbnail.nbytes + size
+        )
+
+    def forget(self, camera):
+        self._cameras.delete(camera)
+
+
+gate = MotionGate()
@@ -1,140 +1,536 @@
 import cv2
 import numpy as np
-from collections import Counter
 import base64
-import os
 
+from .detectors import (
+    get_backend,
+    get_classes,
+    get_input_size,
+    get_model_pool,
+    get_person_class_id,
+)
 
-def detect_objects(image_path, confidence_threshold=0.01):
+
+def _forward(images, backend=None, input_size=None):
+    """
+    Run one forward pass over a list of images
+
+    Returns:
+        list: per image, the list of output layer rows in darknet layout
+    """
+    backend = backend or get_backend()
+    input_size = get_input_size(backend, input_size)
+    pool = get_model_pool(backend)
+
+    blob = cv2.dnn.blobFromImages(
+        images, 1 / 255.0, (input_size, input_size), swapRB=True, crop=False
+    )
+    with pool.acquire() as net:
+        net.setInput(blob)
+        outputs = net.forward(pool.output_layers)
+
+    n = len(images)
+    outputs = [backend.standardize(output, n, input_size) for output in outputs]
+    return [[output[i] for output in outputs] for i in range(n)]
+
+
+def _decode_candidates(outputs, w, h, confidence_threshold, backend=None):
     """
-    Detect objects in an image using YOLOv3, only including objects that are taller than wide
+    Decode raw YOLO output rows into candidate person boxes with NumPy array operations
+
+    Class, confidence, aspect-ratio and person filtering all happen as masks over
+    the whole output, so only plausible person boxes are left for non-maximum
+    suppression.
+
+    Returns:
+        tuple: (int array of [x, y, width, height] boxes, float array of confidences)
+    """
+    detections = np.concatenate(outputs, axis=0)
+    scores = detections[:, 5:]
+    class_ids = np.argmax(scores, axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    person_class_id = get_person_class_id((backend or get_backend()).classes_path)
+    mask = (confidences > confidence_threshold) & (class_ids == person_class_id)
+    detections = detections[mask]
+    confidences = confidences[mask]
+
+    center_x = (detections[:, 0] * w).astype(np.int32)
+    center_y = (detections[:, 1] * h).astype(np.int32)
+    widths = (detections[:, 2] * w).astype(np.int32)
+    heights = (detections[:, 3] * h).astype(np.int32)
+
+    # Only include objects that are taller than wide
+    mask = heights > widths
+    boxes = np.stack(
+        [
+            (center_x - widths / 2).astype(np.int32),
+            (center_y - heights / 2).astype(np.int32),
+            widths,
+            heights,
+        ],
+        axis=1,
+    )[mask]
+    return boxes, confidences[mask].astype(np.float32)
+
+
+def _nms(boxes, confidences, confidence_threshold):
+    """Apply Non-Maximum Suppression and return the kept boxes and confidences"""
+    if len(boxes) == 0:
+        return boxes, confidences
+
+    keep = np.asarray(
+        cv2.dnn.NMSBoxes(
+            boxes.tolist(), confidences.tolist(), confidence_threshold, 0.4
+        ),
+        dtype=np.int64,
+    ).flatten()
+    return boxes[keep], confidences[keep]
+
+
+def _decode_people(outputs, w, h, confidence_threshold, backend=None):
+    """
+    Decode raw YOLO output rows of one image into non-overlapping person boxes
+
+    Returns:
+        tuple: (int array of [x, y, width, height] boxes, float array of confidences)
+    """
+    boxes, confidences = _decode_candidates(
+        outputs, w, h, confidence_threshold, backend
+    )
+    return _nms(boxes, confidences, confidence_threshold)
+
+
+TILE_OVERLAP = 0.25
+# Regions up to this many times the network input are squashed instead of tiled
+TILE_TRIGGER = 1.5
+
+
+def _tile_origins(length, tile):
+    """Offsets of overlapping tiles covering `length` pixels, the last one flush"""
+    if length <= tile:
+        return [0]
+    stride = int(tile * (1 - TILE_OVERLAP))
+    return list(range(0, length - tile, stride)) + [length - tile]
+
+
+def _detect_people_in_roi(
+    image, roi, confidence_threshold, backend=None, input_size=None
+):
+    """
+    Detect people standing inside a queue region of interest
+
+    The frame is cropped to the bounding box of the ROI polygon. Small crops go
+    through the network as a whole; larger ones are cut into overlapping tiles
+    of the network input size, so people keep their native pixel size instead of
+    being squashed together with the whole frame. Tile detections are merged
+    with one NMS across all tiles and only boxes whose feet (bottom center) lie
+    inside the polygon are kept.
 
     Args:
-        image_path (str): Path to the input image
-        confidence_threshold (float): Minimum confidence threshold for detections (0-1)
+        image (numpy.ndarray): Full BGR frame
+        roi (list): Polygon as [x, y] pixel coordinates of the frame
+
+    Returns:
+        tuple: (int array of [x, y, width, height] boxes, float array of confidences)
+    """
+    polygon = np.asarray(roi, dtype=np.float32).reshape(-1, 2)
+    (h, w) = image.shape[:2]
+    x, y, roi_w, roi_h = cv2.boundingRect(polygon)
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + roi_w, w), min(y + roi_h, h)
+    crop = image[y0:y1, x0:x1]
+    if crop.size == 0:
+        return np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.float32)
+
+    backend = backend or get_backend()
+    tile = get_input_size(backend, input_size)
+    (crop_h, crop_w) = crop.shape[:2]
+    if max(crop_h, crop_w) <= tile * TILE_TRIGGER:
+        tiles = [(0, 0, crop)]
+    else:
+        tiles = []
+        for ty in _tile_origins(crop_h, tile):
+            for tx in _tile_origins(crop_w, tile):
+                patch = crop[ty : ty + tile, tx : tx + tile]
+                # Pad edge tiles so every tile keeps the native scale
+                patch = cv2.copyMakeBorder(
+                    patch,
+                    0,
+                    tile - patch.shape[0],
+                    0,
+                    tile - patch.shape[1],
+                    cv2.BORDER_CONSTANT,
+                    value=(127, 127, 127),
+                )
+                tiles.append((tx, ty, patch))
+
+    all_boxes = []
+    all_confidences = []
+    for start in range(0, len(tiles), backend.max_batch_size):
+        chunk = tiles[start : start + backend.max_batch_size]
+        for (tx, ty, patch), outputs in zip(
+            chunk, _forward([patch for _, _, patch in chunk], backend, input_size)
+        ):
+            boxes, confidences = _decode_candidates(
+                outputs, patch.shape[1], patch.shape[0], confidence_threshold, backend
+            )
+            boxes[:, 0] += x0 + tx
+            boxes[:, 1] += y0 + ty
+            all_boxes.append(boxes)
+            all_confidences.append(confidences)
+
+    boxes, confidences = _nms(
+        np.concatenate(all_boxes), np.concatenate(all_confidences), confidence_threshold
+    )
+
+    # Keep the people standing inside the queue polygon
+    inside = np.array(
+        [
+            cv2.pointPolygonTest(polygon, (bx + bw / 2, by + bh), False) >= 0
+            for bx, by, bw, bh in boxes.tolist()
+        ],
+        dtype=bool,
+    )
+    return boxes[inside], confidences[inside]
+
+
+def _locate_people(
+    image, confidence_threshold, roi=None, backend=None, input_size=None
+):
+    """Find the person boxes of one image, limited to the queue ROI if one is given"""
+    if roi:
+        return _detect_people_in_roi(
+            image, roi, confidence_threshold, backend, input_size
+        )
+
+    (h, w) = image.shape[:2]
+    outputs = _forward([image], backend, input_size)[0]
+    return _decode_people(outputs, w, h, confidence_threshold, backend)
+
+
+def _person_label(backend=None):
+    classes_path = (backend or get_backend()).classes_path
+    return get_classes(classes_path)[get_person_class_id(classes_path)]
+
+
+def _count_people(boxes, backend=None):
+    """Return the dict of object counts for a set of person boxes"""
+    return {_person_label(backend): len(boxes)} if len(boxes) else {}
+
+
+def _draw_people(image, boxes, confidences, backend=None):
+    """
+    Draw person boxes onto an image and count them
 
     Returns:
         tuple: (annotated image, dict of object counts)
     """
-    # Load YOLO
-    net = cv2.dnn.readNet("models/yolov3.weights", "models/yolov3.cfg")
+    label = _person_label(backend)
 
-    # Load classes
-    with open("models/coco.names", "r") as f:
-        classes = [line.strip() for line in f.readlines()]
+    # Draw boxes
+    GREEN = (0, 255, 0)  # BGR format in OpenCV
+    for (x, y, width, height), confidence in zip(boxes.tolist(), confidences.tolist()):
+        cv2.rectangle(image, (x, y), (x + width, y + height), GREEN, 2)
+        # Add confidence score to label
+        label_with_confidence = f"{label} {confidence:.2f}"
+        cv2.putText(
+            image,
+            label_with_confidence,
+            (x, y - 10),
+            cv2.FONT_HERSHEY_SIMPLEX,
+            0.5,
+            GREEN,
+            2,
+        )
+
+    return image, _count_people(boxes, backend)
+
+
+def render_annotated_image(
+    image, boxes, confidences, backend=None, quality=90, max_size=None
+):
+    """
+    Draw the detections and encode the result as a base64 JPEG
 
+    Args:
+        quality (int): JPEG quality (0-100)
+        max_size (int): If set, the image is shrunk so its longer side is at most
+            this many pixels before drawing and encoding
+
+    Returns:
+        str: Base64 encoded JPEG
+    """
+    (h, w) = image.shape[:2]
+    if max_size and max(h, w) > max_size:
+        scale = max_size / max(h, w)
+        image = cv2.resize(
+            image, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_AREA
+        )
+        boxes = (boxes * scale).astype(np.int32)
+
+    annotated_image, _ = _draw_people(image, boxes, confidences, backend)
+    _, buffer = cv2.imencode(
+        ".jpg", annotated_image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+    )
+    return base64.b64encode(buffer).decode("utf-8")
+
+
+def _detections(boxes, confidences):
+    """Structured detections for JSON responses"""
+    return [
+        {"x": x, "y": y, "width": width, "height": height, "confidence": confidence}
+        for (x, y, width, height), confidence in zip(
+            boxes.tolist(), confidences.tolist()
+        )
+    ]
+
+
+def detect_objects(
+    image_path, confidence_threshold=0.01, roi=None, detector=None, input_size=None
+):
+    """
+    Detect objects in an image using YOLO, only including objects that are taller than wide
+
+    Args:
+        image_path (str): Path to the input image
+        confidence_threshold (float): Minimum confidence threshold for detections (0-1)
+        roi (list): Optional queue polygon as [x, y] pixel coordinates
+        detector (str): Detector backend name, defaults to DETECTION_BACKEND
+        input_size (int): Network input size, defaults to the backend's
+
+    Returns:
+        tuple: (annotated image, dict of object counts)
+    """
     # Read the image
     image = cv2.imread(image_path)
-    (h, w) = image.shape[:2]
 
-    # Create a blob and pass it through the network
-    blob = cv2.dnn.blobFromImage(image, 1 / 255.0, (416, 416), swapRB=True, crop=False)
-    net.setInput(blob)
-    layer_names = net.getLayerNames()
-    output_layers = [layer_names[i - 1] for i in net.getUnconnectedOutLayers()]
-    outputs = net.forward(output_layers)
-
-    # Initialize lists for detected objects
-    boxes = []
-    confidences = []
-    class_ids = []
-
-    # Loop through detections
-    for output in outputs:
-        for detection in output:
-            scores = detection[5:]
-            class_id = np.argmax(scores)
-            confidence = scores[class_id]
-
-            if confidence > confidence_threshold:
-                # Object detected
-                center_x = int(detection[0] * w)
-                center_y = int(detection[1] * h)
-                width = int(detection[2] * w)
-                height = int(detection[3] * h)
-
-                # Only include objects that are taller than wide
-                if height > width:
-                    # Rectangle coordinates
-                    x = int(center_x - width / 2)
-                    y = int(center_y - height / 2)
-
-                    boxes.append([x, y, width, height])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
-
-    # Apply Non-Maximum Suppression
-    indexes = cv2.dnn.NMSBoxes(boxes, confidences, confidence_threshold, 0.4)
-
-    # Initialize counter for detected objects
-    detected_objects = []
+    backend = get_backend(detector)
+    boxes, confidences = _locate_people(
+        image, confidence_threshold, roi, backend, input_size
+    )
+    return _draw_people(image, boxes, confidences, backend)
 
-    # Draw boxes
-    GREEN = (0, 255, 0)  # BGR format in OpenCV
-    for i in range(len(boxes)):
-        if i in indexes:
-            label = str(classes[class_ids[i]])
-
-            # Filter everything except people
-            if label.lower() != "person":
-                continue
-
-            x, y, width, height = boxes[i]
-            detected_objects.append(label)
-            cv2.rectangle(image, (x, y), (x + width, y + height), GREEN, 2)
-            # Add confidence score to label
-            confidence = confidences[i]
-            label_with_confidence = f"{label} {confidence:.2f}"
-            cv2.putText(
-                image,
-                label_with_confidence,
-                (x, y - 10),
-                cv2.FONT_HERSHEY_SIMPLEX,
-                0.5,
-                GREEN,
-                2,
-            )
 
-    # Count objects
-    object_counts = dict(Counter(detected_objects))
+def _locate_people_batch(
+    images, confidence_threshold, rois=None, backend=None, input_size=None
+):
+    """
+    Find the person boxes of many images, sharing forward passes of up to the
+    backend's max_batch_size images
+
+    Images with a queue ROI are cropped and tiled on their own; all others are
+    batched together.
 
-    return image, object_counts
+    Returns:
+        list: (boxes, confidences) per input image, in order
+    """
+    backend = backend or get_backend()
+    rois = rois or [None] * len(images)
+    results = [None] * len(images)
+
+    whole = []
+    for index, (image, roi) in enumerate(zip(images, rois)):
+        if roi:
+            results[index] = _detect_people_in_roi(
+                image, roi, confidence_threshold, backend, input_size
+            )
+        else:
+            whole.append(index)
+
+    for start in range(0, len(whole), backend.max_batch_size):
+        chunk = whole[start : start + backend.max_batch_size]
+        chunk_outputs = _forward([images[i] for i in chunk], backend, input_size)
+        for index, outputs in zip(chunk, chunk_outputs):
+            (h, w) = images[index].shape[:2]
+            results[index] = _decode_people(
+                outputs, w, h, confidence_threshold, backend
+            )
+    return results
+
+
+# JPEG start-of-frame markers carrying the image dimensions
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB}
+_REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+
+def _jpeg_size(data):
+    """Read (width, height) from a JPEG header, or None if it is not a JPEG"""
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        length = int.from_bytes(data[i + 2 : i + 4], "big")
+        if marker in _JPEG_SOF_MARKERS:
+            height = int.from_bytes(data[i + 5 : i + 7], "big")
+            width = int.from_bytes(data[i + 7 : i + 9], "big")
+            return width, height
+        i += 2 + length
+    return None
+
+
+def decode_image(data, max_dimension=None):
+    """
+    Decode an encoded image (JPEG, PNG, ...) into a BGR array without touching the disk
 
+    Args:
+        data (bytes): Encoded image bytes
+        max_dimension (int): If set, large JPEGs are decoded at 1/2, 1/4 or 1/8
+            resolution as long as their longer side stays at least this big
 
-def detect_objects_from_base64(base64_string, confidence_threshold=0.01):
+    Returns:
+        numpy.ndarray: Decoded BGR image
+    """
+    flags = cv2.IMREAD_COLOR
+    if max_dimension:
+        size = _jpeg_size(data)
+        if size is not None:
+            for factor, reduced_flags in _REDUCED_DECODE_FLAGS:
+                if max(size) // factor >= max_dimension:
+                    flags = reduced_flags
+                    break
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return image
+
+
+def detect_people_from_bytes(
+    data,
+    confidence_threshold=0.01,
+    max_dimension=None,
+    roi=None,
+    detector=None,
+    input_size=None,
+    annotate=False,
+    image_quality=90,
+    image_max_size=None,
+):
     """
-    Detect objects from a base64 encoded image
+    Detect people in encoded image bytes and return structured detections
+
+    The annotated JPEG is only rendered when `annotate` is set, since drawing,
+    encoding and base64-encoding it usually costs more than the counts are worth.
 
     Args:
-        base64_string (str): Base64 encoded image string
+        data (bytes): Encoded image bytes
         confidence_threshold (float): Minimum confidence threshold for detections (0-1)
+        max_dimension (int): Allow reduced-resolution decoding down to this size
+        roi (list): Optional queue polygon as [x, y] pixel coordinates of the
+            full-resolution frame; disables reduced-resolution decoding
+        detector (str): Detector backend name, defaults to DETECTION_BACKEND
+        input_size (int): Network input size, defaults to the backend's
+        annotate (bool): Also return a base64 encoded annotated JPEG
+        image_quality (int): JPEG quality of the annotated image (0-100)
+        image_max_size (int): Longest side of the annotated image in pixels
 
     Returns:
-        tuple: (base64 encoded annotated image, dict of object counts)
+        dict: counts, detections (boxes in image pixels with their confidence)
+            and, if requested, annotated_image
     """
+    # Undecodable data raises a ValueError, unlike failures of the detection
+    image = decode_image(data, None if roi else max_dimension)
     try:
-        # Decode base64 string to image
-        img_data = base64.b64decode(base64_string)
+        backend = get_backend(detector)
+        boxes, confidences = _locate_people(
+            image, confidence_threshold, roi, backend, input_size
+        )
+        # Report boxes in the pixels of the uploaded image, even if it was
+        # decoded at a reduced resolution
+        size = _jpeg_size(data)
+        scale = size[0] / image.shape[1] if size else 1
+        result = {
+            "counts": _count_people(boxes, backend),
+            "detections": _detections((boxes * scale).astype(np.int32), confidences),
+        }
+        if annotate:
+            result["annotated_image"] = render_annotated_image(
+                image, boxes, confidences, backend, image_quality, image_max_size
+            )
+        return result
 
-        # Save temporary file
-        temp_path = "temp_image.jpg"
-        with open(temp_path, "wb") as f:
-            f.write(img_data)
+    except Exception as e:
+        raise Exception(f"Error processing image: {str(e)}")
 
-        # Process image
-        annotated_image, counts = detect_objects(temp_path)
 
-        # Convert annotated image back to base64
-        _, buffer = cv2.imencode(".jpg", annotated_image)
-        encoded_image = base64.b64encode(buffer).decode("utf-8")
+def count_people_from_bytes(
+    data,
+    confidence_threshold=0.01,
+    max_dimension=None,
+    roi=None,
+    detector=None,
+    input_size=None,
+):
+    """
+    Count people in encoded image bytes without rendering an annotated image
+
+    Args:
+        data (bytes): Encoded image bytes
+        confidence_threshold (float): Minimum confidence threshold for detections (0-1)
+        max_dimension (int): Allow reduced-resolution decoding down to this size
+        roi (list): Optional queue polygon as [x, y] pixel coordinates of the
+            full-resolution frame; disables reduced-resolution decoding
+        detector (str): Detector backend name, defaults to DETECTION_BACKEND
+        input_size (int): Network input size, defaults to the backend's
 
-        # Clean up temp file
-        os.remove(temp_path)
+    Returns:
+        int: Number of detected people
+    """
+    image = decode_image(data, None if roi else max_dimension)
+    boxes, _ = _locate_people(
+        image, confidence_threshold, roi, get_backend(detector), input_size
+    )
+    return len(boxes)
+
+
+def detect_counts_batch(
+    images_data,
+    confidence_threshold=0.01,
+    max_dimension=None,
+    rois=None,
+    detector=None,
+    input_size=None,
+):
+    """
+    Count people in many encoded images using batched inference
 
-        return encoded_image, counts
+    Args:
+        images_data (list): Encoded image bytes
+        confidence_threshold (float): Minimum confidence threshold for detections (0-1)
+        max_dimension (int): Allow reduced-resolution decoding down to this size
+        rois (list): Optional queue polygon (or None) per image, see
+            count_people_from_bytes
+        detector (str): Detector backend name, defaults to DETECTION_BACKEND
+        input_size (int): Network input size, defaults to the backend's
 
-    except Exception as e:
-        raise Exception(f"Error processing image: {str(e)}")
+    Returns:
+        list: dict of object counts per input image, in order
+    """
+    rois = rois or [None] * len(images_data)
+    images = []
+    for index, (data, roi) in enumerate(zip(images_data, rois)):
+        try:
+            images.append(decode_image(data, None if roi else max_dimension))
+        except Exception as e:
+            raise ValueError(f"Error decoding image {index}: {str(e)}")
+
+    backend = get_backend(detector)
+    located = _locate_people_batch(
+        images, confidence_threshold, rois, backend, input_size
+    )
+    return [_count_people(boxes, backend) for boxes, _ in located]
 
 
 # Example usage
@@ -0,0 +1,104 @@
+import hashlib
+import os
+import threading
+
+from fastapi import Request, Response
+
+from .cache import LRUCache
+
+# Serialized responses kept in memory, bounded by count and total body size.
+# Writes through the API invalidate them right away, writes from other processes
+# such as the resort loader show up once they expire.
+RESPONSE_CACHE_ENTRIES = int(os.environ.get("RESPONSE_CACHE_ENTRIES", 1024))
+RESPONSE_CACHE_BYTES = int(os.environ.get("RESPONSE_CACHE_BYTES", 32 * 1024 * 1024))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", 5))
+
+response_cache = LRUCache(
+    max_entries=RESPONSE_CACHE_ENTRIES,
+    max_bytes=RESPONSE_CACHE_BYTES,
+    ttl=RESPONSE_CACHE_TTL,
+)
+
+# Bumped on every invalidation, so a response built from data read before a
+# write is never stored after that write has invalidated its key
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def _etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+
+
+async def cached_response(request: Request, key, build):
+    """
+    Serve a JSON response from the cache, building and storing it on a miss
+
+    Args:
+        request: Incoming request, checked for If-None-Match
+        key: Cache key, a tuple starting with the resource kind
+        build: Coroutine function returning the serialized JSON body as bytes
+
+    Returns:
+        The cached body with a strong ETag, or 304 if the client's copy is current
+    """
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = _generation
+        body = await build()
+        etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        entry = (body, etag)
+        with _generation_lock:
+            if generation == _generation:
+                response_cache.set(key, entry, len(body))
+
+    body, etag = entry
+    # Clients may reuse their copy but must revalidate it on every poll
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def invalidate(*keys):
+    """Drop cached responses, e.g. invalidate(("resorts",), ("lifts", 3))"""
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        for key in keys:
+            response_cache.delete(key)
+
+
+def invalidate_resort(resort_id):
+    """Drop every cached response that includes data of one resort"""
+    invalidate(
+        ("resorts",),
+        ("lifts", resort_id),
+        ("huts", resort_id),
+        ("snapshot", resort_id),
+    )
+
+
+def invalidate_huts(*resort_ids):
+    """Drop the cached responses that include the huts of some resorts"""
+    invalidate(
+        *(
+            (kind, resort_id)
+            for resort_id in resort_ids
+            for kind in ("huts", "snapshot")
+        )
+    )
+
+
+def invalidate_lifts(*resort_ids):
+    """Drop the cached responses that include the lifts of some resorts"""
+    invalidate(
+        *(
+            (kind, resort_id)
+            for resort_id in resort_ids
+            for kind in ("lifts", "snapshot")
+        )
+    )
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from datetime import datetime
+from typing import Dict, List, Optional
 
 
 class SkiLiftBase(BaseModel):
@@ -15,6 +16,11 @@ class SkiLiftBase(BaseModel):
     difficulty: str
     path: List[List[float]]
     wait_time: int
+    queue_roi: Optional[List[List[float]]] = None  # polygon in webcam pixels
+    detector: Optional[str] = None  # detector backend, None for the default
+    detector_input_size: Optional[int] = None
+    bottom_elevation: Optional[float] = None  # in m, None if unknown
+    top_elevation: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -60,3 +66,95 @@ class SkiHutBase(BaseModel):
 
 class SkiHut(SkiHutBase):
     id: int
+
+
+class Detection(BaseModel):
+    x: int
+    y: int
+    width: int
+    height: int
+    confidence: float
+
+
+class DetectionResponse(BaseModel):
+    counts: Dict[str, int]
+    detections: List[Detection]
+    fresh: bool = True  # False when the result of an unchanged frame was reused
+    annotated_image: Optional[str] = None  # base64 JPEG, only when requested
+
+
+class DetectionFrame(BaseModel):
+    lift_id: int
+    base64: str
+
+
+class BatchDetectionRequest(BaseModel):
+    frames: List[DetectionFrame]
+    confidence_threshold: float = 0.01
+    detector: Optional[str] = None  # overrides the detector of every lift
+    input_size: Optional[int] = None
+
+
+class FrameDetectionResult(BaseModel):
+    lift_id: int
+    counts: Dict[str, int]
+    fresh: bool = True  # False when the result of an unchanged frame was reused
+
+
+class BatchDetectionResponse(BaseModel):
+    results: List[FrameDetectionResult]
+
+
+class ResortSnapshot(BaseModel):
+    resort: SkiResort
+    lifts: List[SkiLift]
+    huts: List[SkiHut]
+    map_url: str
+    total_lifts: int
+    open_lifts: int
+    average_wait_time: Optional[float] = None  # over open lifts, None if all closed
+    max_wait_time: Optional[int] = None
+
+
+class LiftTelemetry(BaseModel):
+    lift_id: int
+    # Values left out are not changed
+    current_load: Optional[int] = None
+    wait_time: Optional[int] = None
+    status: Optional[str] = None  # 'open', 'closed', 'hold'
+
+
+class HutTelemetry(BaseModel):
+    hut_id: int
+    free_seats: int
+
+
+class TelemetryUpdate(BaseModel):
+    lifts: List[LiftTelemetry] = []
+    huts: List[HutTelemetry] = []
+
+
+class TelemetryResult(BaseModel):
+    id: int
+    updated: bool
+    error: Optional[str] = None
+
+
+class TelemetryResponse(BaseModel):
+    lifts: List[TelemetryResult]
+    huts: List[TelemetryResult]
+
+
+class LiftHistoryBucket(BaseModel):
+    timestamp: datetime
+    samples: int
+    avg_people: float
+    max_people: int
+    avg_wait_time: float
+    max_wait_time: int
+
+
+class LiftHistory(BaseModel):
+    lift_id: int
+    step: str
+    buckets: List[LiftHistoryBucket]
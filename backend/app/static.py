@@ -0,0 +1,223 @@
+import gzip
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+import cv2
+from fastapi import Request, Response
+from fastapi.responses import FileResponse
+
+from .cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # brotli variants are skipped without it
+    brotli = None
+
+# Total size of file contents kept in memory, and the largest file kept
+STATIC_CACHE_BYTES = int(os.environ.get("STATIC_CACHE_BYTES", 64 * 1024 * 1024))
+STATIC_CACHE_MAX_FILE_SIZE = int(
+    os.environ.get("STATIC_CACHE_MAX_FILE_SIZE", 8 * 1024 * 1024)
+)
+# Seconds clients may use a file before revalidating it
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", 300))
+STATIC_WEBP_QUALITY = int(os.environ.get("STATIC_WEBP_QUALITY", 90))
+
+# Precomputed variants live next to the original as <name>.<suffix>
+IMAGE_VARIANTS = [("image/webp", ".webp")]
+ENCODING_VARIANTS = [("br", ".br"), ("gzip", ".gz")]
+# Compressed variants are only kept when they save at least this fraction
+MIN_COMPRESSION_SAVING = 0.1
+
+file_cache = LRUCache(max_entries=4096, max_bytes=STATIC_CACHE_BYTES)
+
+
+def write_variants(path):
+    """
+    Precompute the variants of a static file that serve_file can negotiate
+
+    Images get a WebP copy; every file gets brotli and gzip copies where
+    those are noticeably smaller (so not for already compressed images).
+    """
+    written = []
+    media_type = mimetypes.guess_type(path)[0] or ""
+    if media_type.startswith("image/") and media_type != "image/webp":
+        image = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if image is not None:
+            variant = path + ".webp"
+            cv2.imwrite(variant, image, [cv2.IMWRITE_WEBP_QUALITY, STATIC_WEBP_QUALITY])
+            written.append(variant)
+
+    for source in [path] + written:
+        with open(source, "rb") as f:
+            data = f.read()
+        compressors = [(".gz", lambda data: gzip.compress(data, 9))]
+        if brotli is not None:
+            compressors.append((".br", lambda data: brotli.compress(data, quality=11)))
+        for suffix, compress in compressors:
+            variant = source + suffix
+            compressed = compress(data)
+            if len(compressed) <= len(data) * (1 - MIN_COMPRESSION_SAVING):
+                with open(variant, "wb") as f:
+                    f.write(compressed)
+                written.append(variant)
+            elif os.path.exists(variant):
+                # Left over from an earlier version of the file
+                os.unlink(variant)
+    return written
+
+
+def _accepted(header, token):
+    """Whether an Accept / Accept-Encoding header allows `token` (q > 0)"""
+    for item in (header or "").split(","):
+        name, *params = item.split(";")
+        if name.strip().lower() != token:
+            continue
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def _negotiate(request, path, media_type):
+    """Pick the best stored variant for the request's Accept headers"""
+    accept = request.headers.get("accept")
+    for variant_type, suffix in IMAGE_VARIANTS:
+        if media_type != variant_type and _accepted(accept, variant_type):
+            if os.path.isfile(path + suffix):
+                path, media_type = path + suffix, variant_type
+                break
+
+    accept_encoding = request.headers.get("accept-encoding")
+    for encoding, suffix in ENCODING_VARIANTS:
+        if _accepted(accept_encoding, encoding) and os.path.isfile(path + suffix):
+            return path + suffix, media_type, encoding
+    return path, media_type, None
+
+
+def _load(path):
+    """Return (stat, contents or None) of a file, keeping small files in memory"""
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    entry = file_cache.get(path)
+    if entry is not None and entry[0] == version:
+        return stat, entry[1]
+    if stat.st_size > STATIC_CACHE_MAX_FILE_SIZE:
+        return stat, None
+    with open(path, "rb") as f:
+        data = f.read()
+    file_cache.set(path, (version, data), len(data))
+    return stat, data
+
+
+def _read_range(path, data, start, length):
+    if data is not None:
+        return data[start : start + length]
+    with open(path, "rb") as f:
+        f.seek(start)
+        return f.read(length)
+
+
+def _parse_range(header, size):
+    """
+    Parse a single "bytes=" range into (start, length)
+
+    Returns None to serve the whole file (no or multiple ranges), or "invalid"
+    when the range cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[len("bytes=") :].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start = max(0, size - int(last))
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return "invalid"
+    return start, end - start + 1
+
+
+def _not_modified(request, etag, mtime):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def serve_file(request: Request, path, media_type=None, cache_control=None):
+    """
+    Serve a static file with caching headers, conditional GETs and ranges
+
+    Args:
+        request: Incoming request, for Accept, conditional and Range headers
+        path: File on disk; precomputed variants are looked up next to it
+        media_type: Content type, guessed from the file name if not given
+        cache_control: Cache-Control header, public for STATIC_MAX_AGE by default
+
+    Returns:
+        A 200, 206, 304 or 416 response
+
+    Raises:
+        FileNotFoundError: If the file does not exist
+    """
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    media_type = (
+        media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    )
+    path, media_type, encoding = _negotiate(request, path, media_type)
+    stat, data = _load(path)
+
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": cache_control or f"public, max-age={STATIC_MAX_AGE}",
+        "Vary": "Accept, Accept-Encoding",
+        "Accept-Ranges": "bytes",
+    }
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+
+    if _not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    if_range = request.headers.get("if-range")
+    if if_range is None or if_range.strip() == etag:
+        byte_range = _parse_range(request.headers.get("range"), stat.st_size)
+    if byte_range == "invalid":
+        headers["Content-Range"] = f"bytes */{stat.st_size}"
+        return Response(status_code=416, headers=headers)
+    if byte_range is not None:
+        start, length = byte_range
+        headers["Content-Range"] = f"bytes {start}-{start + length - 1}/{stat.st_size}"
+        return Response(
+            _read_range(path, data, start, length),
+            status_code=206,
+            media_type=media_type,
+            headers=headers,
+        )
+
+    if data is None:
+        # Too large to keep in memory, stream it from disk
+        return FileResponse(path, media_type=media_type, headers=headers)
+    return Response(data, media_type=media_type, headers=headers)
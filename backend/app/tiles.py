@@ -0,0 +1,140 @@
+import hashlib
+import json
+import math
+import os
+import shutil
+
+import cv2
+import numpy as np
+
+TILES_DIR = os.path.join("data", "tiles")
+TILE_SIZE = 256
+# Tile encoding, "webp" or "png"
+MAP_TILE_FORMAT = os.environ.get("MAP_TILE_FORMAT", "webp")
+MAP_TILE_WEBP_QUALITY = int(os.environ.get("MAP_TILE_WEBP_QUALITY", 85))
+
+MEDIA_TYPES = {"webp": "image/webp", "png": "image/png"}
+
+
+def resort_tiles_dir(resort_id):
+    return os.path.join(TILES_DIR, str(resort_id))
+
+
+def tile_path(resort_id, z, x, y, tile_format):
+    return os.path.join(
+        resort_tiles_dir(resort_id), str(z), str(x), f"{y}.{tile_format}"
+    )
+
+
+def find_tile(resort_id, z, x, y):
+    """Return (path, media type) of a stored tile, or None if there is none"""
+    for tile_format, media_type in MEDIA_TYPES.items():
+        path = tile_path(resort_id, z, x, y, tile_format)
+        if os.path.exists(path):
+            return path, media_type
+    return None
+
+
+def read_metadata(resort_id):
+    """Return the pyramid description of a resort, or None if it has no tiles"""
+    try:
+        with open(os.path.join(resort_tiles_dir(resort_id), "tiles.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _content_version(image_path, tile_format):
+    """Short hash of everything the tiles of a render depend on"""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(image_path, "rb") as f:
+        digest.update(f.read())
+    digest.update(f"{tile_format}:{TILE_SIZE}:{MAP_TILE_WEBP_QUALITY}".encode())
+    return digest.hexdigest()
+
+
+def _encode_params(tile_format):
+    if tile_format == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, MAP_TILE_WEBP_QUALITY]
+    return [cv2.IMWRITE_PNG_COMPRESSION, 9]
+
+
+def build_pyramid(image_path, resort_id, map_width, map_height, tile_format=None):
+    """
+    Cut a rendered map into a pyramid of TILE_SIZE tiles
+
+    The deepest zoom level holds the image at full resolution, every level
+    above it halves the size, down to a level that fits into a single tile.
+    Tiles are stored as {z}/{x}/{y} below the resort's tiles directory, next to
+    a tiles.json describing the pyramid. Its `version` changes with the
+    rendered content, and `url` carries it, so clients can cache tiles for long.
+
+    Args:
+        image_path: Rendered map, may have an alpha channel
+        resort_id: Resort the tiles belong to
+        map_width, map_height: Size of the coordinate space of lift paths and
+            hut positions, so clients can place them on any zoom level
+        tile_format: "webp" or "png", defaults to MAP_TILE_FORMAT
+
+    Returns:
+        dict: the pyramid description written to tiles.json
+    """
+    tile_format = tile_format or MAP_TILE_FORMAT
+    image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        raise ValueError(f"Could not read map image {image_path}")
+    if image.ndim == 2:
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGRA)
+    elif image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+
+    height, width = image.shape[:2]
+    max_zoom = max(0, math.ceil(math.log2(max(width, height) / TILE_SIZE)))
+
+    directory = resort_tiles_dir(resort_id)
+    # Tiles of a previous render may not line up with the new ones
+    shutil.rmtree(directory, ignore_errors=True)
+
+    params = _encode_params(tile_format)
+    level = image
+    for z in range(max_zoom, -1, -1):
+        level_height, level_width = level.shape[:2]
+        for x in range(math.ceil(level_width / TILE_SIZE)):
+            for y in range(math.ceil(level_height / TILE_SIZE)):
+                tile = level[
+                    y * TILE_SIZE : (y + 1) * TILE_SIZE,
+                    x * TILE_SIZE : (x + 1) * TILE_SIZE,
+                ]
+                if tile.shape[:2] != (TILE_SIZE, TILE_SIZE):
+                    # Pad edge tiles with transparency to the full tile size
+                    padded = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=level.dtype)
+                    padded[: tile.shape[0], : tile.shape[1]] = tile
+                    tile = padded
+                path = tile_path(resort_id, z, x, y, tile_format)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                cv2.imwrite(path, tile, params)
+
+        if z > 0:
+            level = cv2.resize(
+                level,
+                (max(1, level_width // 2), max(1, level_height // 2)),
+                interpolation=cv2.INTER_AREA,
+            )
+
+    version = _content_version(image_path, tile_format)
+    metadata = {
+        "version": version,
+        "url": f"/ski-resorts/{resort_id}/tiles/{{z}}/{{x}}/{{y}}?v={version}",
+        "tile_size": TILE_SIZE,
+        "format": tile_format,
+        "min_zoom": 0,
+        "max_zoom": max_zoom,
+        # Image size at max_zoom; each level below halves it
+        "width": width,
+        "height": height,
+        "map_width": map_width,
+        "map_height": map_height,
+    }
+    with open(os.path.join(directory, "tiles.json"), "w") as f:
+        json.dump(metadata, f)
+    return metadata
@@ -0,0 +1,202 @@
+"""
+Benchmark lift reads while lift status updates are being written.
+
+A temporary database is filled with synthetic resorts and lifts. A writer
+thread applies bulk wait-time updates like the ingestion service, while
+concurrent readers run the lifts query of the API, using:
+
+- baseline: the previous setup, a sync engine with default journaling
+- sync: the tuned sync engine (WAL, synchronous=NORMAL, busy timeout, pool)
+  used from a thread pool, like sync FastAPI handlers
+- async: the tuned aiosqlite engine used from the event loop
+
+Usage:
+    python scripts/benchmark_database.py [--resorts 20] [--lifts 50]
+        [--readers 32] [--duration 5] [--write-interval 0.05]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy import create_engine, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import models  # noqa: E402
+from app.database import make_async_engine, make_engine  # noqa: E402
+
+
+def lifts_query(resort_id):
+    return select(
+        models.SkiLift.id, models.SkiLift.wait_time, models.SkiLift.current_load
+    ).where(models.SkiLift.resort_id == resort_id)
+
+
+def populate(engine, resorts, lifts):
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        for resort_id in range(1, resorts + 1):
+            db.add(models.SkiResort(id=resort_id, name=f"Resort {resort_id}"))
+            db.add_all(
+                models.SkiLift(
+                    resort_id=resort_id,
+                    name=f"Lift {i}",
+                    capacity=1800,
+                    current_load=0,
+                    status="open",
+                    path=[[float(i), float(j)] for j in range(50)],
+                    wait_time=0,
+                )
+                for i in range(lifts)
+            )
+        db.commit()
+
+
+def write_loop(engine, lift_count, interval, stop, stats):
+    """Update the wait times of a tenth of the lifts per transaction"""
+    Session = sessionmaker(bind=engine)
+    while not stop.is_set():
+        rows = [
+            {"id": lift_id, "wait_time": random.randint(0, 30), "current_load": 0}
+            for lift_id in random.sample(
+                range(1, lift_count + 1), max(1, lift_count // 10)
+            )
+        ]
+        try:
+            with Session() as db:
+                db.execute(update(models.SkiLift), rows)
+                db.commit()
+            stats["writes"] += 1
+        except Exception:
+            stats["write_errors"] += 1
+        time.sleep(interval)
+
+
+def report(name, latencies, errors, duration, write_stats):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0
+    print(
+        f"{name:<9} {len(latencies) / duration:>9.0f} {p95:>9.1f} {errors:>7} "
+        f"{write_stats['writes']:>7} {write_stats['write_errors']:>7}"
+    )
+
+
+def run_sync(name, engine, args):
+    Session = sessionmaker(bind=engine)
+    stop = threading.Event()
+    write_stats = {"writes": 0, "write_errors": 0}
+    writer = threading.Thread(
+        target=write_loop,
+        args=(
+            engine,
+            args.resorts * args.lifts,
+            args.write_interval,
+            stop,
+            write_stats,
+        ),
+    )
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + args.duration
+
+    def read():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                with Session() as db:
+                    db.execute(lifts_query(random.randint(1, args.resorts))).all()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    writer.start()
+    with ThreadPoolExecutor(args.readers) as pool:
+        for _ in range(args.readers):
+            pool.submit(read)
+    stop.set()
+    writer.join()
+    engine.dispose()
+    report(name, latencies, errors, args.duration, write_stats)
+
+
+async def run_async(name, engine, sync_engine, args):
+    Session = async_sessionmaker(engine)
+    stop = threading.Event()
+    write_stats = {"writes": 0, "write_errors": 0}
+    writer = threading.Thread(
+        target=write_loop,
+        args=(
+            sync_engine,
+            args.resorts * args.lifts,
+            args.write_interval,
+            stop,
+            write_stats,
+        ),
+    )
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + args.duration
+
+    async def read():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                async with Session() as db:
+                    result = await db.execute(
+                        lifts_query(random.randint(1, args.resorts))
+                    )
+                    result.all()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    writer.start()
+    await asyncio.gather(*(read() for _ in range(args.readers)))
+    stop.set()
+    writer.join()
+    await engine.dispose()
+    sync_engine.dispose()
+    report(name, latencies, errors, args.duration, write_stats)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--resorts", type=int, default=20)
+    parser.add_argument("--lifts", type=int, default=50)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--write-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(
+        f"{'engine':<9} {'reads/s':>9} {'p95 ms':>9} {'errors':>7} {'writes':>7} {'failed':>7}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ["baseline", "sync", "async"]:
+            # Each run starts from a fresh file, so the journal mode is not inherited
+            db_path = os.path.join(directory, f"{name}.db")
+            url = f"sqlite:///{db_path}"
+            if name == "baseline":
+                engine = create_engine(url, connect_args={"check_same_thread": False})
+            else:
+                engine = make_engine(url)
+            populate(engine, args.resorts, args.lifts)
+
+            if name == "async":
+                async_engine = make_async_engine(f"sqlite+aiosqlite:///{db_path}")
+                asyncio.run(run_async(name, async_engine, engine, args))
+            else:
+                run_sync(name, engine, args)
@@ -0,0 +1,82 @@
+"""
+Benchmark the detector backends for speed and people-count accuracy.
+
+Labeled images live in a directory together with a labels.json mapping each
+file name to the number of people in it, e.g. {"ski_queue1.jpg": 14}.
+Backends whose model files are missing are skipped.
+
+Usage:
+    python scripts/benchmark_detectors.py [--labels data/benchmark/labels.json]
+        [--backends yolov3 yolov3-tiny onnx] [--sizes 320 416 608] [--repeats 3]
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.detectors import BACKENDS, get_input_size  # noqa: E402
+from app.person_detection import _locate_people  # noqa: E402
+
+
+def benchmark(backend, input_size, samples, repeats, confidence_threshold):
+    # Load the network before timing
+    _locate_people(samples[0][1], confidence_threshold, None, backend, input_size)
+
+    errors = []
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for _, image, expected in samples:
+            boxes, _ = _locate_people(
+                image, confidence_threshold, None, backend, input_size
+            )
+            errors.append(len(boxes) - expected)
+    elapsed = time.perf_counter() - start
+
+    ms_per_frame = elapsed / len(errors) * 1000
+    mean_absolute_error = sum(abs(error) for error in errors) / len(errors)
+    bias = sum(errors) / len(errors)
+    return ms_per_frame, mean_absolute_error, bias
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--labels", default="data/benchmark/labels.json")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--confidence-threshold", type=float, default=0.01)
+    args = parser.parse_args()
+
+    labels_path = Path(args.labels)
+    with open(labels_path) as f:
+        labels = json.load(f)
+    samples = [
+        (name, cv2.imread(str(labels_path.parent / name)), expected)
+        for name, expected in sorted(labels.items())
+    ]
+    if not samples:
+        print(f"No labeled images in {labels_path}")
+        sys.exit(1)
+
+    print(f"{len(samples)} labeled images, {args.repeats} repeats\n")
+    print(f"{'backend':<14} {'size':>5} {'ms/frame':>9} {'MAE':>7} {'bias':>7}")
+    for name in args.backends:
+        backend = BACKENDS[name]
+        if not backend.available:
+            print(f"{name:<14} skipped, model files not found")
+            continue
+
+        for input_size in args.sizes or [get_input_size(backend)]:
+            ms_per_frame, mean_absolute_error, bias = benchmark(
+                backend, input_size, samples, args.repeats, args.confidence_threshold
+            )
+            print(
+                f"{name:<14} {input_size:>5} {ms_per_frame:>9.1f} "
+                f"{mean_absolute_error:>7.2f} {bias:>+7.2f}"
+            )
@@ -0,0 +1,178 @@
+"""
+Benchmark parsing an Overpass JSON extract into a WayHandler.
+
+Each method runs in a fresh process that starts with the raw response bytes in
+memory, as the resort loader's workers do, and reports its wall time and the
+growth of the peak resident set size while parsing:
+
+- baseline: the previous path, json.loads, an XML document built by string
+  concatenation, a temp file and WayHandler.apply_file
+- stream: parse_osm_data, which feeds incrementally parsed elements straight
+  into the handler
+
+It then reports the memory per million nodes of the handler's node store,
+NodeLocations, against the dict per node it used before.
+
+Without --input a synthetic extract is generated, mostly pistes with a few
+lifts, huts and water bodies, like a large ski area.
+
+Usage:
+    python scripts/benchmark_osm_parsing.py [--nodes 1000000]
+        [--nodes-per-way 20] [--input overpass.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from load_resort_data import NodeLocations, WayHandler, parse_osm_data  # noqa: E402
+
+
+def generate_extract(path, nodes, nodes_per_way):
+    """Write a synthetic Overpass response, nodes first like Overpass does"""
+    rng = random.Random(0)
+    with open(path, "w") as f:
+        f.write('{"version": 0.6, "generator": "benchmark", "elements": [\n')
+        for node_id in range(1, nodes + 1):
+            lat = 47.0 + rng.random() * 0.5
+            lon = 11.0 + rng.random() * 0.5
+            f.write(
+                f'{{"type": "node", "id": {node_id}, "lat": {lat:.7f}, "lon": {lon:.7f}}},\n'
+            )
+        ways = nodes // nodes_per_way
+        for way_id in range(1, ways + 1):
+            refs = list(
+                range((way_id - 1) * nodes_per_way + 1, way_id * nodes_per_way + 1)
+            )
+            kind = way_id % 20
+            if kind == 0:
+                tags = {"aerialway": "chair_lift", "name": f"Lift {way_id}"}
+            elif kind == 1:
+                tags = {"amenity": "restaurant", "name": f"Hut {way_id}"}
+            elif kind == 2:
+                tags = {"natural": "water", "name": f"Lake {way_id}"}
+                refs.append(refs[0])
+            else:
+                tags = {"piste:type": "downhill", "piste:difficulty": "easy"}
+            separator = ",\n" if way_id < ways else "\n"
+            f.write(
+                json.dumps({"type": "way", "id": way_id, "nodes": refs, "tags": tags})
+                + separator
+            )
+        f.write("]}\n")
+
+
+def parse_baseline(overpass_data):
+    """The XML round trip parse_osm_data replaced"""
+    osm_data = '<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n'
+    for element in json.loads(overpass_data).get("elements", []):
+        if element.get("type") == "way":
+            osm_data += f'  <way id="{element["id"]}">\n'
+            for tag in element.get("tags", {}).items():
+                osm_data += f'    <tag k="{tag[0]}" v="{tag[1]}"/>\n'
+            for node in element.get("nodes", []):
+                osm_data += f'    <nd ref="{node}"/>\n'
+            osm_data += "  </way>\n"
+        elif element.get("type") == "node":
+            osm_data += f'  <node id="{element["id"]}" lat="{element["lat"]}" lon="{element["lon"]}"/>\n'
+    osm_data += "</osm>"
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".osm") as tmp_file:
+        tmp_file.write(osm_data.encode("utf-8"))
+        tmp_file_path = tmp_file.name
+
+    try:
+        handler = WayHandler()
+        handler.apply_file(tmp_file_path)
+    finally:
+        os.unlink(tmp_file_path)
+
+    return handler
+
+
+METHODS = {"baseline": parse_baseline, "stream": parse_osm_data}
+
+
+def measure(method, path):
+    """Run one method on the extract at `path`; runs in a fresh process"""
+    with open(path, "rb") as f:
+        overpass_data = f.read()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    # The handler reports every feature it finds
+    with contextlib.redirect_stdout(io.StringIO()):
+        handler = METHODS[method](overpass_data)
+    elapsed = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "seconds": elapsed,
+        # ru_maxrss is in KiB on Linux
+        "peak_mib": (rss_after - rss_before) / 1024,
+        "features": len(handler.lifts)
+        + len(handler.pistes)
+        + len(handler.water_bodies)
+        + len(handler.huts),
+    }
+
+
+def measure_node_store(store, nodes):
+    """Peak RSS growth of storing `nodes` locations; runs in a fresh process"""
+    rng = random.Random(0)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if store == "dict":
+        locations = {}
+        for node_id in range(1, nodes + 1):
+            locations[node_id] = {
+                "lat": 47.0 + rng.random() * 0.5,
+                "lon": 11.0 + rng.random() * 0.5,
+            }
+    else:
+        locations = NodeLocations()
+        for node_id in range(1, nodes + 1):
+            locations.add(node_id, 47.0 + rng.random() * 0.5, 11.0 + rng.random() * 0.5)
+        # Merges the added nodes into the sorted arrays
+        locations.lookup([1])
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return (rss_after - rss_before) / 1024 / (nodes / 1_000_000)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=1_000_000)
+    parser.add_argument("--nodes-per-way", type=int, default=20)
+    parser.add_argument("--input", help="Overpass JSON response to parse instead")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.input
+        if path is None:
+            path = os.path.join(directory, "overpass.json")
+            generate_extract(path, args.nodes, args.nodes_per_way)
+        print(f"extract: {os.path.getsize(path) / 2**20:.0f} MiB")
+
+        print(f"{'method':<9} {'seconds':>9} {'peak MiB':>9} {'features':>9}")
+        context = multiprocessing.get_context("spawn")
+        for method in METHODS:
+            with context.Pool(1) as pool:
+                result = pool.apply(measure, (method, path))
+            print(
+                f"{method:<9} {result['seconds']:>9.1f} {result['peak_mib']:>9.0f} "
+                f"{result['features']:>9}"
+            )
+
+    print(f"\n{'nodes':<9} {'MiB / 1M nodes':>15}")
+    for store in ["dict", "array"]:
+        with context.Pool(1) as pool:
+            mib = pool.apply(measure_node_store, (store, args.nodes))
+        print(f"{store:<9} {mib:>15.1f}")
@@ -0,0 +1,102 @@
+"""
+Compare the old per-row Python post-processing of YOLO outputs with the
+vectorized decode in app.person_detection on the sample queue images.
+
+Usage: python scripts/benchmark_postprocessing.py [repeats]
+"""
+
+import glob
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.detectors import get_classes  # noqa: E402
+from app.person_detection import _decode_people, _forward  # noqa: E402
+
+CONFIDENCE_THRESHOLD = 0.01
+
+
+def legacy_decode_people(outputs, w, h, confidence_threshold):
+    """The post-processing loop detect_objects used before it was vectorized"""
+    classes = get_classes()
+    boxes = []
+    confidences = []
+    class_ids = []
+
+    for output in outputs:
+        for detection in output:
+            scores = detection[5:]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+
+            if confidence > confidence_threshold:
+                center_x = int(detection[0] * w)
+                center_y = int(detection[1] * h)
+                width = int(detection[2] * w)
+                height = int(detection[3] * h)
+
+                if height > width:
+                    x = int(center_x - width / 2)
+                    y = int(center_y - height / 2)
+
+                    boxes.append([x, y, width, height])
+                    confidences.append(float(confidence))
+                    class_ids.append(class_id)
+
+    indexes = cv2.dnn.NMSBoxes(boxes, confidences, confidence_threshold, 0.4)
+
+    people = []
+    for i in range(len(boxes)):
+        if i in indexes:
+            if classes[class_ids[i]].lower() != "person":
+                continue
+            people.append(boxes[i])
+    return people
+
+
+def time_call(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn()
+    return (time.perf_counter() - start) / repeats * 1000, result
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    image_paths = sorted(glob.glob("data/ski_queue*.jpg"))
+    if not image_paths:
+        print("No sample images found (expected data/ski_queue*.jpg)")
+        sys.exit(1)
+
+    print(
+        f"{'image':<24} {'legacy ms':>10} {'vector ms':>10} {'speedup':>8} {'people':>12}"
+    )
+    total_legacy = total_vector = 0
+    for image_path in image_paths:
+        image = cv2.imread(image_path)
+        (h, w) = image.shape[:2]
+        outputs = _forward([image])[0]
+
+        legacy_ms, legacy_people = time_call(
+            lambda: legacy_decode_people(outputs, w, h, CONFIDENCE_THRESHOLD), repeats
+        )
+        vector_ms, (boxes, _) = time_call(
+            lambda: _decode_people(outputs, w, h, CONFIDENCE_THRESHOLD), repeats
+        )
+        total_legacy += legacy_ms
+        total_vector += vector_ms
+
+        print(
+            f"{Path(image_path).name:<24} {legacy_ms:>10.1f} {vector_ms:>10.1f} "
+            f"{legacy_ms / vector_ms:>7.1f}x {len(legacy_people):>5} / {len(boxes):<5}"
+        )
+
+    print(
+        f"{'total':<24} {total_legacy:>10.1f} {total_vector:>10.1f} "
+        f"{total_legacy / total_vector:>7.1f}x"
+    )
@@ -1,20 +1,131 @@
 import osmium
 import geopandas as gpd
-import matplotlib.pyplot as plt
+import matplotlib
+
+# Maps are only saved to files, also from worker processes without a display
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt  # noqa: E402
 import requests
 import json
 from shapely.geometry import LineString
 import numpy as np
 import tempfile
+import hashlib
+from array import array
+import codecs
+import re
 import os
 import sys
 from pathlib import Path
 import random
 from shapely.geometry import Polygon
+import argparse
+import multiprocessing
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+
+# Add parent directory to Python path, also for the worker processes
+sys.path.append(str(Path(__file__).parent.parent))
 
 # Image dimensions
 IMG_WIDTH = 1600
 IMG_HEIGHT = 1200
+# Resolution of the map tiles relative to the single map image
+TILE_RENDER_SCALE = 4
+# Points per axis of the elevation grid the contours are drawn from
+ELEVATION_GRID_SIZE = int(os.environ.get("ELEVATION_GRID_SIZE", 100))
+
+
+class NodeLocations:
+    """
+    Compact node id -> location index
+
+    Ids are kept in a sorted int64 array and coordinates in int32 arrays of
+    1e-7 degrees, OSM's own fixed-point precision, so a node takes 16 bytes
+    instead of a dict of floats per node. New nodes are appended to typed
+    buffers and merged into the sorted arrays on the next lookup.
+    """
+
+    SCALE = 10_000_000
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.lats = np.empty(0, dtype=np.int32)
+        self.lons = np.empty(0, dtype=np.int32)
+        self._new_ids = array("q")
+        self._new_lats = array("i")
+        self._new_lons = array("i")
+
+    def __len__(self):
+        return len(self.ids) + len(self._new_ids)
+
+    @property
+    def nbytes(self):
+        return (
+            self.ids.nbytes
+            + self.lats.nbytes
+            + self.lons.nbytes
+            + sum(
+                buffer.itemsize * len(buffer)
+                for buffer in (self._new_ids, self._new_lats, self._new_lons)
+            )
+        )
+
+    def add(self, node_id, lat, lon):
+        self._new_ids.append(node_id)
+        self._new_lats.append(round(lat * self.SCALE))
+        self._new_lons.append(round(lon * self.SCALE))
+
+    def _merge(self):
+        ids = np.concatenate([self.ids, np.frombuffer(self._new_ids, dtype=np.int64)])
+        lats = np.concatenate(
+            [self.lats, np.frombuffer(self._new_lats, dtype=np.int32)]
+        )
+        lons = np.concatenate(
+            [self.lons, np.frombuffer(self._new_lons, dtype=np.int32)]
+        )
+        self._new_ids, self._new_lats, self._new_lons = (
+            array("q"),
+            array("i"),
+            array("i"),
+        )
+
+        # Overpass returns nodes sorted by id, so sorting is rarely needed
+        if len(ids) > 1 and not np.all(ids[1:] > ids[:-1]):
+            order = np.argsort(ids, kind="stable")
+            ids, lats, lons = ids[order], lats[order], lons[order]
+            # Keep the last location of a node added more than once
+            last = np.append(ids[1:] != ids[:-1], True)
+            ids, lats, lons = ids[last], lats[last], lons[last]
+        self.ids, self.lats, self.lons = ids, lats, lons
+
+    def lookup(self, refs):
+        """
+        Look up the locations of several nodes at once
+
+        Args:
+            refs: Node ids
+
+        Returns:
+            tuple: (n, 2) array of (lon, lat) of the nodes found, in the order
+                of `refs`, and an array of the ids that were not found
+        """
+        if self._new_ids:
+            self._merge()
+        refs = np.asarray(refs, dtype=np.int64)
+        if not len(self.ids):
+            return np.empty((0, 2)), refs
+        index = np.minimum(np.searchsorted(self.ids, refs), len(self.ids) - 1)
+        found = self.ids[index] == refs
+        index = index[found]
+        coords = np.column_stack((self.lons[index], self.lats[index])) / self.SCALE
+        return coords, refs[~found]
 
 
 class WayHandler(osmium.SimpleHandler):
@@ -24,77 +135,92 @@ class WayHandler(osmium.SimpleHandler):
         self.pistes = []
         self.water_bodies = []
         self.huts = []
-        self.nodes = {}
-        self.way_nodes = {}
+        self.nodes = NodeLocations()
 
     def node(self, n):
-        # Cache node coordinates
-        self.nodes[n.id] = {"lat": n.location.lat, "lon": n.location.lon}
+        self.add_node(n.id, n.location.lat, n.location.lon)
 
     def way(self, w):
-        # Store way nodes first
-        self.way_nodes[w.id] = [node.ref for node in w.nodes]
+        self.add_way(w.id, {tag.k: tag.v for tag in w.tags}, [n.ref for n in w.nodes])
+
+    def add_elements(self, elements):
+        """
+        Feed Overpass JSON elements to the handler, without going through a file
+
+        As in an OSM file, the nodes of a way have to come before the way, which
+        is the order of Overpass' "(._;>;); out body;" output.
+
+        Returns:
+            int: number of elements read
+        """
+        count = 0
+        for element in elements:
+            count += 1
+            if element.get("type") == "node":
+                self.add_node(element["id"], element["lat"], element["lon"])
+            elif element.get("type") == "way":
+                self.add_way(
+                    element["id"], element.get("tags", {}), element.get("nodes", [])
+                )
+        return count
+
+    def add_node(self, node_id, lat, lon):
+        # Cache node coordinates
+        self.nodes.add(node_id, lat, lon)
+
+    def add_way(self, way_id, tags, node_refs):
+        # (lon, lat) of the way's nodes, as an array
+        coords, missing = self.nodes.lookup(node_refs)
 
-        if "aerialway" in w.tags:
+        if "aerialway" in tags:
             print(
-                f"Found aerialway: {w.tags.get('name', 'Unnamed')} - Type: {w.tags.get('aerialway')}"
+                f"Found aerialway: {tags.get('name', 'Unnamed')} - Type: {tags.get('aerialway')}"
             )
             try:
-                # Create linestring from node coordinates
-                coords = []
-                for node_ref in w.nodes:
-                    node = self.nodes.get(node_ref.ref)
-                    if node:
-                        coords.append((node["lon"], node["lat"]))
-                    else:
-                        print(f"Warning: Missing node {node_ref.ref}")
+                for node_ref in missing:
+                    print(f"Warning: Missing node {node_ref}")
 
                 if len(coords) < 2:
                     print(
-                        f"Warning: Not enough coordinates for lift {w.tags.get('name', 'Unnamed')}"
+                        f"Warning: Not enough coordinates for lift {tags.get('name', 'Unnamed')}"
                     )
                     return
 
                 line = LineString(coords)
 
                 lift_data = {
-                    "name": w.tags.get("name", "Unnamed Lift"),
-                    "type": w.tags.get("aerialway", "unknown"),
-                    "difficulty": w.tags.get("piste:difficulty", "intermediate"),
+                    "name": tags.get("name", "Unnamed Lift"),
+                    "type": tags.get("aerialway", "unknown"),
+                    "difficulty": tags.get("piste:difficulty", "intermediate"),
                     "status": "open",
                     "geometry": line,
-                    "capacity": int(w.tags.get("aerialway:capacity", "1800")),
-                    "description": w.tags.get("description", ""),
+                    "capacity": int(tags.get("aerialway:capacity", "1800")),
+                    "description": tags.get("description", ""),
                 }
                 self.lifts.append(lift_data)
                 print(f"Successfully added lift: {lift_data['name']}")
             except Exception as e:
                 print(f"Error processing lift: {str(e)}")
-                print(f"Node refs: {[node.ref for node in w.nodes]}")
+                print(f"Node refs: {node_refs}")
 
         # Add piste handling
-        if "piste:type" in w.tags:
+        if "piste:type" in tags:
             try:
-                coords = []
-                for node_ref in w.nodes:
-                    node = self.nodes.get(node_ref.ref)
-                    if node:
-                        coords.append((node["lon"], node["lat"]))
-                    else:
-                        print(f"Warning: Missing node {node_ref.ref}")
+                for node_ref in missing:
+                    print(f"Warning: Missing node {node_ref}")
 
                 if len(coords) < 2:
                     print(
-                        f"Warning: Not enough coordinates for piste {w.tags.get('name', 'Unnamed')}"
+                        f"Warning: Not enough coordinates for piste {tags.get('name', 'Unnamed')}"
                     )
                     return
 
                 line = LineString(coords)
 
                 piste_data = {
-                    "name": w.tags.get("name", "Unnamed Piste"),
-                    "type": w.tags.get("piste:type", "downhill"),
-                    "difficulty": w.tags.get("piste:difficulty", "intermediate"),
+                    "name": tags.get("name", "Unnamed Piste"),
+                    "type": tags.get("piste:type", "downhill"),
+                    "difficulty": tags.get("piste:difficulty", "intermediate"),
                     "geometry": line,
                 }
                 self.pistes.append(piste_data)
@@ -103,41 +229,33 @@ class WayHandler(osmium.SimpleHandler):
                 print(f"Error processing piste: {str(e)}")
 
         # Updated water body handling
-        if "natural" in w.tags and w.tags["natural"] == "water" or "water" in w.tags:
+        if "natural" in tags and tags["natural"] == "water" or "water" in tags:
             try:
-                coords = []
-                node_refs = self.way_nodes[w.id]
-
-                # Get coordinates for each node
-                for node_ref in node_refs:
-                    node = self.nodes.get(node_ref)
-                    if node:
-                        coords.append((node["lon"], node["lat"]))
-
                 if len(coords) < 3:  # Need at least 3 points for a polygon
                     print(
-                        f"Warning: Not enough coordinates for water body {w.tags.get('name', 'Unnamed')}"
+                        f"Warning: Not enough coordinates for water body {tags.get('name', 'Unnamed')}"
                     )
                     return
 
                 # Ensure the polygon is closed
-                if coords[0] != coords[-1]:
-                    coords.append(coords[0])
+                ring = coords
+                if not np.array_equal(ring[0], ring[-1]):
+                    ring = np.vstack((ring, ring[:1]))
 
                 try:
                     # Create polygon and validate it
-                    polygon = Polygon(coords)
+                    polygon = Polygon(ring)
                     if not polygon.is_valid:
                         print(
-                            f"Warning: Invalid polygon for water body {w.tags.get('name', 'Unnamed')}"
+                            f"Warning: Invalid polygon for water body {tags.get('name', 'Unnamed')}"
                         )
                         return
 
                     water_data = {
-                        "name": w.tags.get("name", "Unnamed Water Body"),
-                        "type": w.tags.get(
+                        "name": tags.get("name", "Unnamed Water Body"),
+                        "type": tags.get(
                             "natural",
-                            w.tags.get("water", w.tags.get("waterway", "unknown")),
+                            tags.get("water", tags.get("waterway", "unknown")),
                         ),
                         "geometry": polygon,
                     }
@@ -150,33 +268,22 @@ class WayHandler(osmium.SimpleHandler):
                 print(f"Error processing water body: {str(e)}")
 
         # Add hut/restaurant handling
-        if (
-            "amenity" in w.tags and w.tags["amenity"] in ["restaurant", "cafe", "bar"]
-        ) or (
-            "tourism" in w.tags
-            and w.tags["tourism"] in ["alpine_hut", "wilderness_hut"]
+        if ("amenity" in tags and tags["amenity"] in ["restaurant", "cafe", "bar"]) or (
+            "tourism" in tags and tags["tourism"] in ["alpine_hut", "wilderness_hut"]
         ):
             try:
-                # Get the center point of the way
-                coords = []
-                for node_ref in w.nodes:
-                    node = self.nodes.get(node_ref.ref)
-                    if node:
-                        coords.append((node["lon"], node["lat"]))
-
-                if not coords:
+                if not len(coords):
                     return
 
                 # Calculate centroid for point placement
-                center_lon = sum(c[0] for c in coords) / len(coords)
-                center_lat = sum(c[1] for c in coords) / len(coords)
+                center_lon, center_lat = coords.mean(axis=0).tolist()
 
                 hut_data = {
-                    "name": w.tags.get("name", "Unnamed Hut"),
-                    "type": w.tags.get("amenity", w.tags.get("tourism", "unknown")),
-                    "description": w.tags.get("description", ""),
+                    "name": tags.get("name", "Unnamed Hut"),
+                    "type": tags.get("amenity", tags.get("tourism", "unknown")),
+                    "description": tags.get("description", ""),
                     "coordinates": (center_lon, center_lat),
-                    "elevation": 0,  # Will be populated later
+                    "elevation": 0,  # Sampled from the DEM, if there is one
                 }
                 self.huts.append(hut_data)
                 print(f"Successfully added hut: {hut_data['name']}")
@@ -184,9 +291,116 @@ class WayHandler(osmium.SimpleHandler):
                 print(f"Error processing hut: {str(e)}")
 
 
-def get_elevation_data(bounds):
+# On-disk cache of Nominatim, Overpass and elevation responses
+OSM_CACHE_DIR = os.environ.get("OSM_CACHE_DIR", os.path.join("data", "osm_cache"))
+# Seconds before a cached response is fetched again
+OSM_CACHE_TTLS = {
+    "nominatim": int(os.environ.get("OSM_CACHE_TTL_NOMINATIM", 30 * 24 * 3600)),
+    "overpass": int(os.environ.get("OSM_CACHE_TTL_OVERPASS", 7 * 24 * 3600)),
+    "elevation": int(os.environ.get("OSM_CACHE_TTL_ELEVATION", 365 * 24 * 3600)),
+}
+
+
+class CacheMiss(Exception):
+    """A response is not cached and the cache may not fetch it"""
+
+
+class ResponseCache:
+    """
+    Persistent cache of web API responses, one file per request
+
+    Entries are keyed by the kind of request and its parameters (query,
+    bounds) and stored as <kind>/<hash>.body with a <hash>.json next to it
+    describing the request. A cache directory filled by one run can be copied
+    to hosts without network access and used there with offline=True.
+
+    Args:
+        directory: Where entries are stored
+        offline: Never fetch, raise CacheMiss for missing entries and use
+            entries regardless of their age
+        ttls: Seconds entries of each kind stay fresh, OSM_CACHE_TTLS by default
+    """
+
+    def __init__(self, directory=OSM_CACHE_DIR, offline=False, ttls=None):
+        self.directory = directory
+        self.offline = offline
+        self.ttls = ttls or OSM_CACHE_TTLS
+
+    def _path(self, kind, key):
+        digest = hashlib.sha256(
+            json.dumps(key, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        return os.path.join(self.directory, kind, digest)
+
+    def _write(self, path, data):
+        # Several resorts are fetched from threads, never expose partial files
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), delete=False
+        ) as tmp_file:
+            tmp_file.write(data)
+        os.replace(tmp_file.name, path)
+
+    def fetch(self, kind, key, request):
+        """
+        Return the cached response body of a request, fetching it if needed
+
+        Args:
+            kind: "nominatim", "overpass" or "elevation"
+            key: JSON-serializable request parameters
+            request: Called without arguments to fetch the body as bytes; should
+                raise for unusable responses, so they are not cached
+
+        Returns:
+            bytes: the response body
+
+        Raises:
+            CacheMiss: If offline and the response is not cached
+        """
+        path = self._path(kind, key)
+        try:
+            with open(path + ".json") as f:
+                fetched_at = json.load(f)["fetched_at"]
+            with open(path + ".body", "rb") as f:
+                cached = f.read()
+        except (OSError, ValueError, KeyError):
+            cached = None
+
+        if self.offline:
+            if cached is None:
+                raise CacheMiss(f"No cached {kind} response for {key}")
+            return cached
+        if cached is not None and time.time() - fetched_at < self.ttls[kind]:
+            return cached
+
+        try:
+            data = request()
+        except Exception as e:
+            if cached is None:
+                raise
+            print(f"Using expired cached {kind} response, request failed: {e}")
+            return cached
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write(path + ".body", data)
+        self._write(
+            path + ".json",
+            json.dumps({"kind": kind, "key": key, "fetched_at": time.time()}).encode(
+                "utf-8"
+            ),
+        )
+        return data
+
+
+def fetch_cached(cache, kind, key, request):
+    """Fetch a response body through `cache`, or directly if it is None"""
+    if cache is None:
+        return request()
+    return cache.fetch(kind, key, request)
+
+
+def get_elevation_data(bounds, cache=None):
     """Fetch elevation data from Open-Elevation API"""
-    GRID_SIZE = 100  # Changed from 50 to match the coordinate grid
+    GRID_SIZE = ELEVATION_GRID_SIZE
 
     url = "https://api.open-elevation.com/api/v1/lookup"
     points = []
@@ -199,18 +413,21 @@ def get_elevation_data(bounds):
         for lon in lon_range:
             points.append({"latitude": lat, "longitude": lon})
 
-    try:
+    def request():
         response = requests.post(url, json={"locations": points})
         if response.status_code != 200:
-            print(
-                f"Error: Failed to get elevation data (Status: {response.status_code})"
+            raise Exception(
+                f"Failed to get elevation data (Status: {response.status_code})"
             )
-            return np.zeros((GRID_SIZE, GRID_SIZE))
+        if "results" not in response.json():
+            raise Exception("Unexpected API response format")
+        return response.content
 
-        results = response.json()
-        if "results" not in results:
-            print("Error: Unexpected API response format")
-            return np.zeros((GRID_SIZE, GRID_SIZE))
+    try:
+        body = fetch_cached(
+            cache, "elevation", {"bounds": bounds, "grid_size": GRID_SIZE}, request
+        )
+        results = json.loads(body)
 
         elevations = np.array([r["elevation"] for r in results["results"]]).reshape(
             GRID_SIZE, GRID_SIZE
@@ -223,6 +440,8 @@ def get_elevation_data(bounds):
 
         return elevations
 
+    except CacheMiss:
+        raise
     except Exception as e:
         print(f"Error fetching elevation data: {str(e)}")
         return np.zeros((GRID_SIZE, GRID_SIZE))
@@ -284,23 +503,81 @@ def plot_contours(ax, X, Y, elevations, bounds):
     ax.set_axis_off()
 
 
-def extract_ski_lifts(area_name):
-    """Extract ski lifts for a given area and create a clean map"""
+# Nominatim's usage policy allows one request per second
+NOMINATIM_MIN_INTERVAL = 1.0
+_nominatim_lock = threading.Lock()
+_nominatim_last_request = 0.0
+
+
+# Overpass reports runtime errors in a top-level "remark" after the elements
+_OVERPASS_REMARK = re.compile(rb'"remark"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_OVERPASS_EMPTY_ELEMENTS = re.compile(rb'"elements"\s*:\s*\[\s*\]')
+# Bytes at the start and end of a response that hold everything but elements
+OVERPASS_ENVELOPE_SIZE = 4096
+
+
+def check_overpass_response(overpass_data):
+    """
+    Raise for Overpass responses that do not hold a complete result
+
+    Timeouts and other runtime errors are answered with status 200, a partial
+    or empty elements array and a "remark", and must not be cached.
+    """
+    # The (large) elements array is not searched, the remark follows it
+    tail = overpass_data[-OVERPASS_ENVELOPE_SIZE:]
+    for match in _OVERPASS_REMARK.finditer(tail):
+        remark = match.group(1).decode(errors="replace")
+        if "error" in remark.lower():
+            raise Exception(f"Overpass API reported: {remark}")
+    if _OVERPASS_EMPTY_ELEMENTS.search(overpass_data[:OVERPASS_ENVELOPE_SIZE]):
+        raise Exception("Overpass API returned no elements")
+
+
+def fetch_resort_data(area_name, cache=None, fetch_elevation=True):
+    """
+    Fetch the bounds, OSM data and elevation grid of an area
+
+    Only waits on the web APIs, so several areas can be fetched from threads.
+
+    Args:
+        area_name: Name of the area in OSM
+        cache: ResponseCache for the API responses, None to always fetch
+        fetch_elevation: Whether to get the elevation grid from Open-Elevation,
+            not needed with a local DEM
+
+    Returns:
+        dict: bounds, the raw Overpass JSON response and the elevation grid
+    """
     # First, get the area boundary from Nominatim
     nominatim_url = (
         f"https://nominatim.openstreetmap.org/search?q={area_name}&format=json"
     )
     headers = {"User-Agent": "SkiLiftMapper/1.0 (your@email.com)"}
-    response = requests.get(nominatim_url, headers=headers)
 
-    # Debugging
-    print(f"Nominatim Status Code: {response.status_code}")
-    print(f"Response content: {response.text}")
+    def request_nominatim():
+        global _nominatim_last_request
 
-    if response.status_code != 200:
-        raise Exception(f"Nominatim API returned status code {response.status_code}")
+        with _nominatim_lock:
+            # Resorts are fetched concurrently, keep to Nominatim's rate limit
+            delay = _nominatim_last_request + NOMINATIM_MIN_INTERVAL - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            response = requests.get(nominatim_url, headers=headers)
+            _nominatim_last_request = time.monotonic()
 
-    results = response.json()
+        # Debugging
+        print(f"Nominatim Status Code: {response.status_code}")
+        print(f"Response content: {response.text}")
+
+        if response.status_code != 200:
+            raise Exception(
+                f"Nominatim API returned status code {response.status_code}"
+            )
+        return response.content
+
+    results = json.loads(
+        fetch_cached(cache, "nominatim", {"q": area_name}, request_nominatim)
+    )
     if not results:
         raise Exception(f"No results found for area: {area_name}")
 
@@ -340,56 +617,99 @@ def extract_ski_lifts(area_name):
     out body;
     """
 
-    # Increase timeout and add error handling
-    api = "https://overpass-api.de/api/interpreter"
-    try:
-        response = requests.post(api, data={"data": query}, timeout=60)
-    except requests.exceptions.Timeout:
-        print("Trying alternative Overpass API endpoint...")
-        api = "https://overpass.kumi.systems/api/interpreter"
-        response = requests.post(api, data={"data": query}, timeout=60)
+    def request_overpass():
+        # Increase timeout and add error handling
+        api = "https://overpass-api.de/api/interpreter"
+        try:
+            response = requests.post(api, data={"data": query}, timeout=60)
+        except requests.exceptions.Timeout:
+            print("Trying alternative Overpass API endpoint...")
+            api = "https://overpass.kumi.systems/api/interpreter"
+            response = requests.post(api, data={"data": query}, timeout=60)
 
-    print(f"Number of elements returned: {len(response.json().get('elements', []))}")
-    print(f"Raw Response: {response.text[:500]}...")
+        print(f"Raw Response: {response.content[:500].decode(errors='replace')}...")
 
-    if response.status_code != 200:
-        raise Exception(f"Overpass API returned status code {response.status_code}")
+        if response.status_code != 200:
+            raise Exception(f"Overpass API returned status code {response.status_code}")
 
-    if "text/html" in response.headers.get("content-type", ""):
-        raise Exception(
-            "Overpass API returned HTML instead of OSM data. The API might be overloaded."
-        )
+        if "text/html" in response.headers.get("content-type", ""):
+            raise Exception(
+                "Overpass API returned HTML instead of OSM data. The API might be overloaded."
+            )
+        check_overpass_response(response.content)
+        return response.content
 
-    osm_data = '<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6">\n'
-    for element in response.json().get("elements", []):
-        if element.get("type") == "way":
-            osm_data += f'  <way id="{element["id"]}">\n'
-            for tag in element.get("tags", {}).items():
-                osm_data += f'    <tag k="{tag[0]}" v="{tag[1]}"/>\n'
-            for node in element.get("nodes", []):
-                osm_data += f'    <nd ref="{node}"/>\n'
-            osm_data += "  </way>\n"
-        elif element.get("type") == "node":
-            osm_data += f'  <node id="{element["id"]}" lat="{element["lat"]}" lon="{element["lon"]}"/>\n'
-    osm_data += "</osm>"
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".osm") as tmp_file:
-        tmp_file.write(osm_data.encode("utf-8"))
-        tmp_file_path = tmp_file.name
+    overpass_data = fetch_cached(
+        cache, "overpass", {"query": query, "bounds": bounds}, request_overpass
+    )
+    elevations = get_elevation_data(bounds, cache) if fetch_elevation else None
 
-    try:
-        handler = WayHandler()
-        handler.apply_file(tmp_file_path)
-    finally:
-        os.unlink(tmp_file_path)
+    return {"bounds": bounds, "overpass": overpass_data, "elevations": elevations}
 
-    print("Number of lifts found:", len(handler.lifts))
-    if handler.lifts:
-        print("Sample lift data:", handler.lifts[0])
 
-    if not handler.lifts:
-        raise Exception("No lift data found for this area")
+# Bytes of an Overpass response decoded at a time
+OVERPASS_CHUNK_SIZE = 64 * 1024
+_ELEMENTS_START = re.compile(r'"elements"\s*:\s*\[')
+
+
+def iter_overpass_elements(chunks):
+    """
+    Incrementally parse the "elements" array of an Overpass JSON response
+
+    Only the current chunk and element are held as Python objects, instead of
+    the whole decoded document.
+
+    Args:
+        chunks: Iterable of bytes, e.g. the response body in pieces
+
+    Yields:
+        dict: one OSM element at a time
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    in_elements = False
+    for chunk in chunks:
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+        if not in_elements:
+            match = _ELEMENTS_START.search(buffer)
+            if match is None:
+                continue
+            position = match.end()
+            in_elements = True
+        while True:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if buffer[position] == "]":
+                return
+            try:
+                element, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # The element continues in the next chunk
+                break
+            yield element
+    if in_elements:
+        raise ValueError("Overpass response ended inside the elements array")
+
+
+def parse_osm_data(overpass_data):
+    """Run the elements of an Overpass JSON response through a WayHandler"""
+    chunks = (
+        overpass_data[start : start + OVERPASS_CHUNK_SIZE]
+        for start in range(0, len(overpass_data), OVERPASS_CHUNK_SIZE)
+    )
+    handler = WayHandler()
+    count = handler.add_elements(iter_overpass_elements(chunks))
+    print(f"Number of elements returned: {count}")
+    return handler
+
 
+def render_map(handler, bounds, elevations):
+    """Draw contours, water bodies, pistes and huts into a new figure"""
     try:
         gdf = gpd.GeoDataFrame(handler.lifts)
     except Exception as e:
@@ -399,8 +719,6 @@ def extract_ski_lifts(area_name):
 
     gdf.set_crs(epsg=4326, inplace=True)  # Set coordinate reference system to WGS84
 
-    elevations = get_elevation_data(bounds)
-
     fig, ax = plt.subplots(figsize=(IMG_WIDTH / 100, IMG_HEIGHT / 100))
 
     # Remove margins/padding
@@ -514,16 +832,109 @@ def extract_ski_lifts(area_name):
         #    color="#8B4513",  # Using brown hex code
         # )
 
-    plt.savefig(
-        "data/ski_map.png",
-        dpi=200,
-        bbox_inches="tight",
-        pad_inches=0,
-        format="png",
-        transparent=True,
-    )
 
-    return handler.lifts, bounds, handler
+def add_dem_elevations(handler, bounds, dem_path):
+    """
+    Sample elevations of an area from a local DEM
+
+    Fills in the elevation of the huts and the bottom and top elevation of
+    the lifts, all with one vectorized lookup each.
+
+    Returns:
+        np.ma.MaskedArray: the contour grid, masked where the DEM has no data
+    """
+    from app.elevation import DemElevation
+
+    lift_ends = np.array(
+        [
+            [lift["geometry"].coords[0], lift["geometry"].coords[-1]]
+            for lift in handler.lifts
+        ]
+    ).reshape(-1, 2, 2)
+    hut_coords = np.array([hut["coordinates"] for hut in handler.huts]).reshape(-1, 2)
+
+    with DemElevation(dem_path) as dem:
+        grid = dem.grid(bounds, ELEVATION_GRID_SIZE)
+        lift_end_elevations = dem.sample(lift_ends[..., 0], lift_ends[..., 1])
+        hut_elevations = dem.sample(hut_coords[:, 0], hut_coords[:, 1])
+
+    for lift, end_elevations in zip(handler.lifts, lift_end_elevations):
+        known = end_elevations[~np.isnan(end_elevations)]
+        if len(known):
+            lift["bottom_elevation"] = round(float(known.min()), 1)
+            lift["top_elevation"] = round(float(known.max()), 1)
+    for hut, elevation in zip(handler.huts, hut_elevations):
+        if not np.isnan(elevation):
+            hut["elevation"] = round(float(elevation), 1)
+
+    grid = np.ma.masked_invalid(grid)
+    if grid.mask.all():
+        print(f"Warning: The DEM at {dem_path} does not cover {bounds}")
+        return np.zeros((ELEVATION_GRID_SIZE, ELEVATION_GRID_SIZE))
+    return grid
+
+
+def process_resort(resort_id, data, dem_path=None):
+    """
+    Parse and render one resort; runs in a worker process
+
+    Elevations come from the DEM at `dem_path` if given, otherwise from the
+    fetched elevation grid, without hut and lift elevations.
+
+    Returns:
+        dict: map file name and the lift and hut records in map pixels
+    """
+    handler = parse_osm_data(data["overpass"])
+
+    print("Number of lifts found:", len(handler.lifts))
+    if handler.lifts:
+        print("Sample lift data:", handler.lifts[0])
+
+    if not handler.lifts:
+        raise Exception("No lift data found for this area")
+
+    bounds = data["bounds"]
+    elevations = data["elevations"]
+    if dem_path is not None:
+        elevations = add_dem_elevations(handler, bounds, dem_path)
+    render_map(handler, bounds, elevations)
+    map_filename = save_map_for_resort(plt, resort_id)
+
+    lifts = [
+        {
+            "name": lift_data["name"],
+            "type": lift_data["type"],
+            "difficulty": lift_data["difficulty"],
+            "status": lift_data["status"],
+            "capacity": lift_data["capacity"],
+            "description": lift_data["description"],
+            "bottom_elevation": lift_data.get("bottom_elevation"),
+            "top_elevation": lift_data.get("top_elevation"),
+            # Convert geometry to pixel coordinates
+            "path": [
+                transform_coords(lon, lat, bounds, IMG_WIDTH, IMG_HEIGHT)
+                for lon, lat in lift_data["geometry"].coords
+            ],
+        }
+        for lift_data in handler.lifts
+    ]
+    huts = [
+        {
+            "name": hut_data["name"],
+            "type": hut_data["type"],
+            "description": hut_data["description"],
+            "elevation": hut_data["elevation"],
+            "coordinates": transform_coords(
+                hut_data["coordinates"][0],
+                hut_data["coordinates"][1],
+                bounds,
+                IMG_WIDTH,
+                IMG_HEIGHT,
+            ),
+        }
+        for hut_data in handler.huts
+    ]
+    return {"map_filename": map_filename, "lifts": lifts, "huts": huts}
 
 
 def save_map_for_resort(plt, resort_id):
@@ -547,16 +958,204 @@ def save_map_for_resort(plt, resort_id):
         format="png",
         transparent=True,
     )
+
+    # WebP and compressed copies for content negotiation when serving the map
+    from app.static import write_variants
+    from app.tiles import build_pyramid
+
+    write_variants(map_path)
+
+    # Render again at a higher resolution and cut it into a tile pyramid
+
+    with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp_file:
+        tile_source_path = tmp_file.name
+    try:
+        plt.savefig(
+            tile_source_path,
+            dpi=dpi * TILE_RENDER_SCALE,
+            bbox_inches="tight",
+            pad_inches=0,
+            format="png",
+            transparent=True,
+        )
+        metadata = build_pyramid(tile_source_path, resort_id, IMG_WIDTH, IMG_HEIGHT)
+        print(
+            f"Map tiles saved for zoom levels 0-{metadata['max_zoom']} "
+            f"({metadata['width']}x{metadata['height']})"
+        )
+    finally:
+        os.unlink(tile_source_path)
+
     plt.close()
     return map_filename
 
 
+def write_resort(resort_id, resort_info, result):
+    """Store a processed resort with its lifts and huts in one transaction"""
+    from app.database import SessionLocal
+    from app.models import SkiHut, SkiLift, SkiResort
+
+    lifts = result["lifts"]
+    db = SessionLocal()
+    try:
+        # Create the ski resort
+        ski_resort = SkiResort(
+            id=resort_id,
+            name=resort_info["name"],
+            location=resort_info["location"],
+            description=resort_info["description"],
+            image_url=f"/maps/{result['map_filename']}",
+            website_url=resort_info["website"],
+            status="open",
+            snow_depth=random.randint(10, 100),
+            weather_conditions=random.choice(["sunny", "cloudy", "snowing"]),
+            total_lifts=len(lifts),
+            open_lifts=sum(1 for lift in lifts if lift.get("status") == "open"),
+        )
+        db.add(ski_resort)
+
+        print(f"Adding {len(lifts)} new lift records...")
+        for lift_data in lifts:
+            lift = SkiLift(
+                resort_id=resort_id,
+                name=lift_data["name"],
+                capacity=lift_data["capacity"],
+                current_load=0,
+                description=lift_data["description"],
+                image_url="",
+                webcam_url="",
+                status=random.choice(["open", "closed"]),
+                type=lift_data["type"],
+                difficulty=lift_data["difficulty"],
+                path=lift_data["path"],
+                bottom_elevation=lift_data["bottom_elevation"],
+                top_elevation=lift_data["top_elevation"],
+                wait_time=random.randint(0, 10),
+            )
+            db.add(lift)
+
+        # Add huts
+        print(f"Adding {len(result['huts'])} new hut records...")
+        for hut_data in result["huts"]:
+            hut = SkiHut(
+                resort_id=resort_id,
+                name=hut_data["name"],
+                type=hut_data["type"],
+                description=hut_data["description"],
+                free_seats=random.randint(0, 100),
+                status=random.choice(["open", "closed"]),
+                coordinates=json.dumps(hut_data["coordinates"]),
+                elevation=hut_data["elevation"],
+            )
+            db.add(hut)
+
+        db.commit()
+        print(f"New resort (ID: {resort_id}) and lift data committed successfully")
+        print(f"Map saved as: {result['map_filename']}")
+    except Exception as e:
+        print(f"Error during database operations: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def load_resorts(resorts, workers, fetch_concurrency, cache=None, dem_path=None):
+    """
+    Fetch, process and store resorts as a pipeline
+
+    Downloads run in a thread pool, parsing and rendering in a process pool,
+    and every database write happens here in the calling thread, so there is
+    a single writer. Resort ids follow the order of `resorts`, which lets the
+    workers name map files before anything is written.
+
+    A CacheMiss of an offline cache stops the whole run instead of skipping
+    the resort. With a `dem_path`, elevations are sampled from that local DEM
+    instead of being fetched.
+    """
+    with (
+        ThreadPoolExecutor(fetch_concurrency) as fetchers,
+        ProcessPoolExecutor(
+            workers, mp_context=multiprocessing.get_context("spawn")
+        ) as processors,
+    ):
+        pending = {}
+        for resort_id, resort_info in enumerate(resorts, start=1):
+            print(f"\nFetching resort: {resort_info['name']}")
+            future = fetchers.submit(
+                fetch_resort_data, resort_info["name"], cache, dem_path is None
+            )
+            pending[future] = ("fetch", resort_id, resort_info)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, resort_id, resort_info = pending.pop(future)
+                try:
+                    result = future.result()
+                except CacheMiss:
+                    for future in pending:
+                        future.cancel()
+                    raise
+                except Exception as e:
+                    print(f"Error processing resort: {resort_info['name']}: {str(e)}")
+                    continue
+
+                if stage == "fetch":
+                    print(f"\nProcessing resort: {resort_info['name']}")
+                    future = processors.submit(
+                        process_resort, resort_id, result, dem_path
+                    )
+                    pending[future] = ("process", resort_id, resort_info)
+                else:
+                    write_resort(resort_id, resort_info, result)
+
+
 if __name__ == "__main__":
-    # Add parent directory to Python path
-    sys.path.append(str(Path(__file__).parent.parent))
+    from app.elevation import DEM_PATH, dem_files
 
-    from app.database import engine, SessionLocal
-    from app.models import Base, SkiLift, SkiResort, SkiHut
+    parser = argparse.ArgumentParser(
+        description="Load the resorts of data/ski_resorts.json into the database"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="processes parsing and rendering resorts",
+    )
+    parser.add_argument(
+        "--fetch-concurrency",
+        type=int,
+        default=4,
+        help="resorts downloaded at the same time",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=OSM_CACHE_DIR,
+        help="directory of cached Nominatim, Overpass and elevation responses",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="only use cached responses, fail on the first one missing",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always fetch and do not store responses",
+    )
+    parser.add_argument(
+        "--dem",
+        default=DEM_PATH,
+        help="GeoTIFF DEM file or directory of tiles to sample elevations from, "
+        "Open-Elevation is used if there is none",
+    )
+    args = parser.parse_args()
+    if args.offline and args.no_cache:
+        parser.error("--offline needs the cache")
+    cache = None if args.no_cache else ResponseCache(args.cache_dir, args.offline)
+
+    from app.database import engine
+    from app.models import Base
 
     # Load ski resorts from JSON file
     with open(Path(__file__).parent.parent / "data" / "ski_resorts.json") as f:
@@ -566,95 +1165,8 @@ if __name__ == "__main__":
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
 
-    # Process each resort
-    for resort_info in SKI_RESORTS:
-        print(f"\nProcessing resort: {resort_info['name']}")
-        try:
-            # Get the lift data and bounds
-            lifts, bounds, handler = extract_ski_lifts(resort_info["name"])
+    dem_path = args.dem if dem_files(args.dem) else None
+    if dem_path is None:
+        print(f"No DEM at {args.dem}, fetching elevations from Open-Elevation")
 
-            db = SessionLocal()
-            try:
-                # Create the ski resort
-                ski_resort = SkiResort(
-                    name=resort_info["name"],
-                    location=resort_info["location"],
-                    description=resort_info["description"],
-                    image_url="",  # Will update after getting resort_id
-                    website_url=resort_info["website"],
-                    status="open",
-                    snow_depth=random.randint(10, 100),
-                    weather_conditions=random.choice(["sunny", "cloudy", "snowing"]),
-                    total_lifts=len(lifts),
-                    open_lifts=sum(1 for lift in lifts if lift.get("status") == "open"),
-                )
-
-                db.add(ski_resort)
-                db.flush()  # Get the resort_id
-
-                # Save the map with resort_id and update the image_url
-                map_filename = save_map_for_resort(plt, ski_resort.id)
-                ski_resort.image_url = f"/maps/{map_filename}"
-
-                print(f"Adding {len(lifts)} new lift records...")
-                for lift_data in lifts:
-                    # Convert geometry to pixel coordinates
-                    coords = list(lift_data["geometry"].coords)
-                    pixel_coords = [
-                        transform_coords(lon, lat, bounds, IMG_WIDTH, IMG_HEIGHT)
-                        for lon, lat in coords
-                    ]
-
-                    # Create lift entry
-                    lift = SkiLift(
-                        resort_id=ski_resort.id,
-                        name=lift_data["name"],
-                        capacity=lift_data["capacity"],
-                        current_load=0,
-                        description=lift_data["description"],
-                        image_url="",
-                        webcam_url="",
-                        status=random.choice(["open", "closed"]),
-                        type=lift_data["type"],
-                        difficulty=lift_data["difficulty"],
-                        path=json.dumps(pixel_coords),
-                        wait_time=random.randint(0, 10),
-                    )
-                    db.add(lift)
-
-                # Add huts
-                print(f"Adding {len(handler.huts)} new hut records...")
-                for hut_data in handler.huts:
-                    # Convert coordinates to pixels
-                    pixel_coords = transform_coords(
-                        hut_data["coordinates"][0],
-                        hut_data["coordinates"][1],
-                        bounds,
-                        IMG_WIDTH,
-                        IMG_HEIGHT,
-                    )
-
-                    hut = SkiHut(
-                        resort_id=ski_resort.id,
-                        name=hut_data["name"],
-                        type=hut_data["type"],
-                        description=hut_data["description"],
-                        free_seats=random.randint(0, 100),
-                        status=random.choice(["open", "closed"]),
-                        coordinates=json.dumps(pixel_coords),
-                        elevation=hut_data["elevation"],
-                    )
-                    db.add(hut)
-
-                db.commit()
-                print(
-                    f"New resort (ID: {ski_resort.id}) and lift data committed successfully"
-                )
-                print(f"Map saved as: {map_filename}")
-            except Exception as e:
-                print(f"Error during database operations: {e}")
-                db.rollback()
-            finally:
-                db.close()
-        except Exception as e:
-            print(f"Error processing resort: {resort_info['name']}: {str(e)}")
+    load_resorts(SKI_RESORTS, args.workers, args.fetch_concurrency, cache, dem_path)
@@ -0,0 +1,37 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+const API_URL = process.env.BACKEND_URL || 'http://localhost:8000'
+
+export const dynamic = 'force-dynamic'
+
+export async function GET(
+    request: NextRequest,
+    { params }: { params: { resortId: string } }
+) {
+    try {
+        const response = await fetch(`${API_URL}/ski-resorts/${params.resortId}/events`, {
+            method: 'GET',
+            cache: 'no-store',
+            // Close the backend stream when the browser disconnects
+            signal: request.signal,
+        })
+
+        if (!response.ok || !response.body) {
+            throw new Error(`Backend responded with status: ${response.status}`)
+        }
+
+        // Pass the event stream through without buffering it
+        return new Response(response.body, {
+            headers: {
+                'Content-Type': 'text/event-stream',
+                'Cache-Control': 'no-cache',
+            },
+        })
+    } catch (error) {
+        console.error('Error streaming resort events:', error)
+        return NextResponse.json(
+            { error: 'Failed to stream resort events' },
+            { status: 500 }
+        )
+    }
+}
@@ -2,25 +2,55 @@ import { NextRequest, NextResponse } from 'next/server'
 
 const API_URL = process.env.BACKEND_URL || 'http://localhost:8000'
 
+export const dynamic = 'force-dynamic'
+
+// Lets the backend negotiate the format and answer revalidation and ranges
+const FORWARDED_REQUEST_HEADERS = [
+    'Accept',
+    'If-None-Match',
+    'If-Modified-Since',
+    'Range',
+    'If-Range',
+]
+
+// Content-Encoding and Content-Length are left out, fetch already decodes the body
+const FORWARDED_RESPONSE_HEADERS = [
+    'Content-Type',
+    'ETag',
+    'Last-Modified',
+    'Cache-Control',
+    'Vary',
+    'Accept-Ranges',
+    'Content-Range',
+]
+
+function pickHeaders(source: Headers, names: string[]) {
+    const headers = new Headers()
+    for (const name of names) {
+        const value = source.get(name)
+        if (value !== null) {
+            headers.set(name, value)
+        }
+    }
+    return headers
+}
+
 export async function GET(
     request: NextRequest,
     { params }: { params: { resortId: string } }
 ) {
     try {
+        // Caching is left to the browser, based on the backend's headers
         const response = await fetch(`${API_URL}/ski-resorts/${params.resortId}/map`, {
             method: 'GET',
+            headers: pickHeaders(request.headers, FORWARDED_REQUEST_HEADERS),
             cache: 'no-store',
         })
 
-        if (!response.ok) {
-            throw new Error(`Backend responded with status: ${response.status}`)
-        }
-
-        const imageBlob = await response.blob()
-        return new NextResponse(imageBlob, {
-            headers: {
-                'Content-Type': 'image/png'
-            }
+        // 304 and 206 are passed through like any other status
+        return new Response(response.status === 304 ? null : response.body, {
+            status: response.status,
+            headers: pickHeaders(response.headers, FORWARDED_RESPONSE_HEADERS),
         })
     } catch (error) {
         console.error('Error fetching resort map:', error)
@@ -29,4 +59,4 @@ export async function GET(
             { status: 500 }
         )
     }
-} 
\ No newline at end of file
+}
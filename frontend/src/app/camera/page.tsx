@@ -53,6 +53,7 @@ export default function CameraPage() {
                 },
                 body: JSON.stringify({
                     base64: base64Image,
+                    annotate: true,
                 }),
             })
 
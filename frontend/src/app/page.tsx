@@ -4,7 +4,7 @@ import { useState, useEffect, useCallback } from 'react'
 import { Button } from '@/components/ui/button'
 import { Badge } from '@/components/ui/badge'
 import { HoverCard, HoverCardContent, HoverCardTrigger } from '@/components/ui/hover-card'
-import { getResorts, getResortLifts, getResortMap, getResortHuts } from '@/lib/api'
+import { getResorts, getResortSnapshot } from '@/lib/api'
 import { Lift } from '@/types/lift'
 import { Map } from '@/components/Map'
 import { ThemeToggle } from '@/components/theme-toggle'
@@ -125,7 +125,7 @@ export default function Home() {
         }
     }, [resorts, router])
 
-    // Fetch lifts and map when selected resort changes
+    // Fetch the resort snapshot when the selected resort changes
     useEffect(() => {
         if (!selectedResort || isLoading) return
 
@@ -133,14 +133,13 @@ export default function Home() {
             try {
                 setIsLoading(true)
                 setLifts([]) // Clear existing lifts while loading
-                const [liftsData, mapUrlData, hutsData] = await Promise.all([
-                    getResortLifts(selectedResort.id),
-                    getResortMap(selectedResort.id),
-                    getResortHuts(selectedResort.id)
-                ])
-                setLifts(liftsData)
-                setMapUrl(mapUrlData)
-                setHuts(hutsData.map(hut => ({
+                // The resort, its lifts and huts and the map location come in one snapshot
+                const snapshot = await getResortSnapshot(selectedResort.id)
+                setSelectedResort(snapshot.resort)
+                setLifts(snapshot.lifts)
+                // Loaded by the browser through the proxy, so it can cache and revalidate it
+                setMapUrl(`/api${snapshot.map_url}`)
+                setHuts(snapshot.huts.map(hut => ({
                     ...hut,
                     coordinates: JSON.parse(hut.coordinates)
                 })))
@@ -158,12 +157,44 @@ export default function Home() {
         }
 
         fetchResortData()
-        return () => {
-            if (mapUrl) {
-                URL.revokeObjectURL(mapUrl)
-            }
+    }, [selectedResort?.id])
+
+    // Apply lift and hut changes pushed by the backend on top of the snapshot
+    useEffect(() => {
+        if (!selectedResort) return
+
+        const applyChanges = <T extends { id: string | number }>(items: T[], data: string) => {
+            const changes: Partial<T>[] = JSON.parse(data)
+            const byId = new globalThis.Map(changes.map(change => [String(change.id), change]))
+            return items.map(item => {
+                const change = byId.get(String(item.id))
+                return change ? { ...item, ...change } : item
+            })
         }
-    }, [selectedResort])
+
+        const source = new EventSource(`/api/resorts/${selectedResort.id}/events`)
+        source.addEventListener('lifts', event => {
+            setLifts(current => applyChanges(current, (event as MessageEvent).data))
+        })
+        source.addEventListener('huts', event => {
+            setHuts(current => applyChanges(current, (event as MessageEvent).data))
+        })
+        // Sent when this client fell behind: reload the state, the stream reconnects
+        source.addEventListener('reset', async () => {
+            try {
+                const snapshot = await getResortSnapshot(selectedResort.id)
+                setLifts(snapshot.lifts)
+                setHuts(snapshot.huts.map(hut => ({
+                    ...hut,
+                    coordinates: JSON.parse(hut.coordinates)
+                })))
+            } catch (err) {
+                console.error('Failed to reload resort data:', err)
+            }
+        })
+
+        return () => source.close()
+    }, [selectedResort?.id])
 
     // Add styles loaded check
     useEffect(() => {
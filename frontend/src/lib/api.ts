@@ -1,5 +1,5 @@
 import { Lift } from '@/types/lift'
-import { SkiResort } from '@/types/resort'
+import { ResortSnapshot, SkiResort } from '@/types/resort'
 
 export async function getResorts(): Promise<SkiResort[]> {
     const response = await fetch('/api/resorts', {
@@ -33,18 +33,20 @@ export async function getResortLifts(resortId: number): Promise<Lift[]> {
     return response.json()
 }
 
-export async function getResortMap(resortId: number): Promise<string> {
-    const response = await fetch(`/api/resorts/${resortId}/map`, {
+export async function getResortSnapshot(resortId: number): Promise<ResortSnapshot> {
+    const response = await fetch(`/api/resorts/${resortId}/snapshot`, {
         method: 'GET',
+        headers: {
+            'Content-Type': 'application/json',
+        },
         cache: 'no-store',
     })
 
     if (!response.ok) {
-        throw new Error(`Failed to fetch resort map: ${response.statusText}`)
+        throw new Error(`Failed to fetch resort snapshot: ${response.statusText}`)
     }
 
-    const blob = await response.blob()
-    return URL.createObjectURL(blob)
+    return response.json()
 }
 
 export async function getResortHuts(resortId: number) {
@@ -1,3 +1,6 @@
+import { Hut } from './huts'
+import { Lift } from './lift'
+
 export interface SkiResort {
     id: number
     name: string
@@ -10,4 +13,15 @@ export interface SkiResort {
     weather_conditions: string
     total_lifts: number
     open_lifts: number
-} 
\ No newline at end of file
+} 
+
+export interface ResortSnapshot {
+    resort: SkiResort
+    lifts: Lift[]
+    huts: (Omit<Hut, 'coordinates'> & { coordinates: string })[]
+    map_url: string
+    total_lifts: number
+    open_lifts: number
+    average_wait_time: number | null
+    max_wait_time: number | null
+}